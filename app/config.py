@@ -8,18 +8,48 @@ class Config:
     image_dpi = 300
     optimize = 2
     max_workers = 3
+    cpu_cores = 0  # cores shared by all OCR jobs (0 = all available)
+    worker_max_jobs = 50  # recycle an OCR worker process after this many files
+    worker_max_memory_mb = 1024  # ... or once its memory grows above this
+    ocr_page_timeout = 600  # kill an OCR run that reports no progress for this many seconds (0 = off)
+    ocr_job_timeout = 0  # kill an OCR run (file, chunk or batch) after this many seconds (0 = off)
+    shard_pages = 0  # split PDFs with more pages than this into chunks OCR'd in parallel (0 = off)
+    shard_chunk_pages = 50  # pages per chunk
+    batch_size = 1  # OCR up to this many small PDFs in one run (1 = off)
+    batch_small_pages = 2  # PDFs with at most this many pages count as small
+    batch_max_wait = 2.0  # seconds to wait for a partial batch to fill up
+    schedule_policy = "fifo"  # order of queued files: "fifo", "sjf" (shortest job first) or "fair" (fair share)
+    schedule_aging = 10.0  # pages a queued file gains in priority per minute of waiting (sjf, fair)
+    schedule_session_weight = 1.0  # share of each uploading browser session relative to the input folder (fair)
+    cache_max_mb = 2048  # size limit of the OCR result cache (0 = off)
+    keep_finished_jobs = 1000  # finished jobs kept in memory for the UI (older ones stay in the journal only)
+    keep_finished_hours = 24  # ... and for at most this long
+    input_stable_seconds = 2.0  # an input file without close event counts as written after this long unchanged
+    convert_workers = 0  # PDF pages rendered to images in parallel (0 = one per available core)
+    convert_window_pages = 8  # pages rendered per step of a PDF-to-image conversion
+    upload_max_mb = 2048  # largest accepted upload (0 = unlimited)
+    download_digests = False  # send SHA-256 digests (Repr-Digest) with downloads, hashed when files are published
+    scratch_dir = ""  # work area for files being produced, e.g. a tmpfs ("" = WORK_DIR/scratch)
+    multi_node = False  # several instances share DATA_DIR (e.g. on NFS) and split the input folder between them
+    node_heartbeat_seconds = 10.0  # interval of each instance's heartbeat
+    node_lease_seconds = 60.0  # an instance without heartbeat for this long is dead, its files go back to the input
+    node_rescan_seconds = 10.0  # interval of listing input and output folders for files of other instances
 
     DATA_DIR = "/data"
     INPUT_DIR = os.path.join(DATA_DIR, "input")
     OUTPUT_DIR = os.path.join(DATA_DIR, "output")
     MERGE_DIR = os.path.join(DATA_DIR, "merge")
     CONVERT_DIR = os.path.join(DATA_DIR, "convert")
+    WORK_DIR = os.path.join(DATA_DIR, "work")
+    CACHE_DIR = os.path.join(DATA_DIR, "cache")
     CONFIG_FILE = "config.txt"
+    JOURNAL_FILE = os.path.join(DATA_DIR, "jobs.db")
+    NODES_DIR = os.path.join(DATA_DIR, "nodes")  # per-instance state in multi-node mode
 
     SUPPORTED_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.ppm', '.pgm', '.pbm')
 
     # Ensure required directories exist
-    for d in [INPUT_DIR, OUTPUT_DIR, MERGE_DIR, CONVERT_DIR]:
+    for d in [INPUT_DIR, OUTPUT_DIR, MERGE_DIR, CONVERT_DIR, WORK_DIR, CACHE_DIR]:
         os.makedirs(d, exist_ok=True)
 
     # Map between config keys in file and class attributes
@@ -28,6 +58,32 @@ class Config:
         "image_dpi": ("image_dpi", int),
         "optimize": ("optimize", int),
         "max_workers": ("max_workers", int),
+        "cpu_cores": ("cpu_cores", int),
+        "worker_max_jobs": ("worker_max_jobs", int),
+        "worker_max_memory_mb": ("worker_max_memory_mb", int),
+        "ocr_page_timeout": ("ocr_page_timeout", float),
+        "ocr_job_timeout": ("ocr_job_timeout", float),
+        "shard_pages": ("shard_pages", int),
+        "shard_chunk_pages": ("shard_chunk_pages", int),
+        "batch_size": ("batch_size", int),
+        "batch_small_pages": ("batch_small_pages", int),
+        "batch_max_wait": ("batch_max_wait", float),
+        "schedule_policy": ("schedule_policy", str),
+        "schedule_aging": ("schedule_aging", float),
+        "schedule_session_weight": ("schedule_session_weight", float),
+        "cache_max_mb": ("cache_max_mb", int),
+        "keep_finished_jobs": ("keep_finished_jobs", int),
+        "keep_finished_hours": ("keep_finished_hours", float),
+        "input_stable_seconds": ("input_stable_seconds", float),
+        "convert_workers": ("convert_workers", int),
+        "convert_window_pages": ("convert_window_pages", int),
+        "upload_max_mb": ("upload_max_mb", int),
+        "scratch_dir": ("scratch_dir", str),
+        "download_digests": ("download_digests", lambda value: value.lower() in ("1", "true", "yes")),
+        "multi_node": ("multi_node", lambda value: value.lower() in ("1", "true", "yes")),
+        "node_heartbeat_seconds": ("node_heartbeat_seconds", float),
+        "node_lease_seconds": ("node_lease_seconds", float),
+        "node_rescan_seconds": ("node_rescan_seconds", float),
     }
 
     @staticmethod
@@ -2,15 +2,16 @@ import logging
 import os
 import secrets
 import sys
-import threading
+from datetime import datetime
 
 from config import Config
-from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from nicegui import app, ui
-from pages import page_convert, page_index, page_merge, page_settings
-from services import DirectoryWatcher, apply_nicegui_patch, processor
-from starlette.middleware.sessions import SessionMiddleware
+from pages import page_convert, page_index, page_merge, page_settings, page_stats
+from services import (DirectoryWatcher, NodeCoordinator, UploadError, apply_nicegui_patch, convert_image, converter, cpu_executor, download_timing, file_download,
+                      get_file_list, io_executor, iter_zip, parse_content_range, processor, purge_stale, registry, safe_filename, start_indexes, upload_offset,
+                      write_upload_chunk)
 
 # Logging configuration: INFO+ level to stdout
 logging.basicConfig(
@@ -25,9 +26,6 @@ apply_nicegui_patch()
 # Static files
 app.add_static_files('/static', 'static', max_cache_age=3600)
 
-# Add SessionMiddleware with a secret key
-app.add_middleware(SessionMiddleware, secret_key=secrets.token_hex(32))
-
 # Load configuration
 Config.load_config()
 
@@ -52,8 +50,19 @@ def settings():
     page_settings()
 
 
-@ui.page("/download/{filename}")
-async def download_file(filename: str):
+@ui.page("/stats")
+def stats():
+    page_stats()
+
+
+@app.get("/metrics")
+def metrics():
+    """Metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.api_route("/download/{filename}", methods=["GET", "HEAD"])
+def download_file(filename: str, request: Request):
     """Secure endpoint for downloading files"""
     # Validate filename to prevent path traversal
     if ".." in filename or "/" in filename or "\\" in filename:
@@ -65,13 +74,87 @@ async def download_file(filename: str):
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File does not exist")
 
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/octet-stream"
+    # ETag/Last-Modified validation (304) and Range resumes (206)
+    return file_download(file_path, filename, request.headers)
+
+
+# Directories offered as ZIP archives, by URL name
+ZIP_DIRS = {
+    os.path.basename(Config.OUTPUT_DIR): Config.OUTPUT_DIR,
+    os.path.basename(Config.CONVERT_DIR): Config.CONVERT_DIR,
+}
+
+
+@app.get("/zip/{folder}")
+def download_zip_archive(folder: str):
+    """Stream all files of a folder as a ZIP archive, built while it is sent"""
+    if folder not in ZIP_DIRS:
+        raise HTTPException(status_code=404, detail="Folder does not exist")
+
+    dir = ZIP_DIRS[folder]
+    names = [f["name"] for f in get_file_list(dir=dir)]
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+
+    # Sync generator: Starlette iterates it in a worker thread, off the event loop
+    return StreamingResponse(
+        iter_zip(dir, names),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="ocr_machine_files_{timestamp}.zip"'},
+        background=download_timing("zip"),
     )
 
 
+# Directories accepting resumable uploads, by URL name
+UPLOAD_DIRS = {
+    os.path.basename(Config.INPUT_DIR): Config.INPUT_DIR,
+    os.path.basename(Config.MERGE_DIR): Config.MERGE_DIR,
+    os.path.basename(Config.CONVERT_DIR): Config.CONVERT_DIR,
+}
+
+
+def upload_target(folder: str, filename: str):
+    if folder not in UPLOAD_DIRS:
+        raise HTTPException(status_code=404, detail="Folder does not exist")
+    try:
+        return UPLOAD_DIRS[folder], safe_filename(filename)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+
+@app.get("/upload/{folder}/{filename}")
+def upload_status(folder: str, filename: str):
+    """Bytes received so far of a resumable upload; the client continues from this offset"""
+    dir, filename = upload_target(folder, filename)
+    return {"offset": upload_offset(dir, filename)}
+
+
+@app.put("/upload/{folder}/{filename}")
+async def upload_chunk(folder: str, filename: str, request: Request):
+    """
+    Resumable upload: PUT the file in chunks with `Content-Range: bytes start-end/total`
+    (a request without Content-Range carries the whole file).
+    """
+    dir, filename = upload_target(folder, filename)
+    if dir == Config.INPUT_DIR and request.client:
+        processor.set_owner(os.path.join(dir, filename), f"client:{request.client.host}")  # fair-share scheduling
+    try:
+        if "content-range" in request.headers:
+            start, _, total = parse_content_range(request.headers["content-range"])
+        else:
+            start, total = 0, int(request.headers.get("content-length", 0))
+        offset = await write_upload_chunk(dir, filename, start, total, request.stream())
+    except UploadError as e:
+        return JSONResponse({"detail": str(e), "offset": e.offset}, status_code=e.status)
+
+    # Same follow-up as an upload through the UI
+    path = os.path.join(dir, filename)
+    if offset == total and dir == Config.CONVERT_DIR:
+        await io_executor.run(converter.add_file, path)
+    elif offset == total and filename.lower().endswith(Config.SUPPORTED_IMAGE_EXTENSIONS):
+        await cpu_executor.run(convert_image, path)
+    return {"offset": offset, "complete": offset == total}
+
+
 # File watcher
 def watcher_input_handler(filepath: str):
     logging.info(f"New file detected: {filepath}")
@@ -79,16 +162,45 @@ def watcher_input_handler(filepath: str):
     processor.add_file(path=filepath)
 
 
-watcher = DirectoryWatcher(Config.INPUT_DIR, watcher_input_handler)
+def watcher_backlog_handler(filepaths: list):
+    logging.info(f"Queueing {len(filepaths)} existing files")
+    # Add files to processing queue in one batch
+    processor.add_files(paths=filepaths)
+
+
+# Several instances sharing DATA_DIR: each keeps its work area and job journal under NODES_DIR/<node>
+# and claims input files before OCR; folders are listed periodically to see the other instances' files
+rescan_seconds = 0
+if Config.multi_node:
+    coordinator = NodeCoordinator(Config.NODES_DIR, Config.INPUT_DIR, heartbeat_seconds=Config.node_heartbeat_seconds,
+                                  lease_seconds=Config.node_lease_seconds, status=processor.node_status)
+    Config.WORK_DIR = coordinator.work_dir
+    Config.JOURNAL_FILE = coordinator.journal_file
+    processor.coordinator = coordinator
+    coordinator.start()
+    rescan_seconds = Config.node_rescan_seconds
+
+# Scratch files and half-written copies of a previous run are never completed; in multi-node mode
+# the other instances' files are told apart by their age
+purge_stale([Config.INPUT_DIR, Config.OUTPUT_DIR, Config.MERGE_DIR, Config.CONVERT_DIR],
+            min_age=Config.node_lease_seconds if Config.multi_node else 0)
+
+# Keep in-memory listings of the directories shown in the UI
+start_indexes([Config.OUTPUT_DIR, Config.MERGE_DIR, Config.CONVERT_DIR], rescan_seconds=rescan_seconds)
+
+# Resume jobs from the journal and start OCR workers (pool size follows Config.max_workers)
+processor.start()
+
+watcher = DirectoryWatcher(
+    Config.INPUT_DIR,
+    watcher_input_handler,
+    on_new_files=watcher_backlog_handler,
+    on_scan_progress=processor.set_backlog_progress,
+    stable_seconds=Config.input_stable_seconds,
+    rescan_seconds=rescan_seconds,
+)
 watcher.start()
 
-# Start background thread for processing loop
-threading.Thread(
-    target=processor.process_loop,
-    daemon=True,
-    name="ProcessorLoop"
-).start()
-
 # Start NiceGUI app
 ui.run(
     title="OCR Machine",
@@ -96,6 +208,9 @@ ui.run(
     reload=False,
     binding_refresh_interval=1,
     reconnect_timeout=600,
+    # Session cookie secret (NiceGUI adds the SessionMiddleware); the browser id in it is the owner of uploads
+    # for fair-share scheduling
+    storage_secret=secrets.token_hex(32),
     # uvicorn_logging_level="debug",
     dark=False
 )
@@ -2,3 +2,4 @@ from .page_convert import page_convert
 from .page_index import page_index
 from .page_merge import page_merge
 from .page_settings import page_settings
+from .page_stats import page_stats
@@ -0,0 +1,58 @@
+from nicegui import ui
+from services import get_file_page, get_listing_version
+
+ROWS_PER_PAGE = 50
+
+
+class FileTable:
+    """
+    Table of the files in a directory, paged and sorted on the server.
+    Only the rows of the visible page are sent to the browser.
+    """
+
+    def __init__(self, dir: str, columns: list, row_map=None, rows_per_page: int = ROWS_PER_PAGE, sort_by: str = "name"):
+        """
+        :param dir: directory to list
+        :param columns: table columns; the `name` and `size` columns sort by file name and size
+        :param row_map: optional function(row: dict, position: int) -> dict shaping each row
+        """
+        self.dir = dir
+        self.row_map = row_map or (lambda row, position: row)
+        self.version = None  # listing version shown in the table
+        self.table = ui.table(
+            columns=columns,
+            rows=[],
+            row_key="name",
+            pagination={"rowsPerPage": rows_per_page, "page": 1, "sortBy": sort_by, "descending": False, "rowsNumber": 0},
+        )
+        self.table.on("request", lambda e: self.refresh(e.args["pagination"]))
+
+    def refresh(self, pagination: dict = None):
+        """Load the requested page (default: the current one)"""
+        pagination = dict(pagination or self.table.pagination)
+        self.version = get_listing_version(self.dir)
+        per_page = pagination.get("rowsPerPage") or 0  # 0 = all rows
+        page = max(1, pagination.get("page") or 1)
+        files, total = get_file_page(
+            self.dir,
+            offset=(page - 1) * per_page,
+            limit=per_page or None,
+            sort_by=pagination.get("sortBy") or "name",
+            descending=bool(pagination.get("descending")),
+        )
+        # Step back when the current page emptied, e.g. after files were removed
+        if not files and total and page > 1:
+            pagination["page"] = max(1, -(-total // per_page))
+            return self.refresh(pagination)
+
+        offset = (page - 1) * per_page
+        pagination.update(page=page, rowsNumber=total)
+        self.table.pagination = pagination
+        self.table.rows = [self.row_map(row, offset + i) for i, row in enumerate(files, start=1)]
+        self.table.update()
+        return total
+
+    def refresh_if_changed(self):
+        """Reload the current page only when the directory changed since the last load"""
+        if get_listing_version(self.dir) != self.version:
+            self.refresh()
@@ -1,77 +1,89 @@
 import logging
-import os
-import shutil
 from pathlib import Path
 
 from config import Config
 from nicegui import ui
-from services import download_zip, get_file_list, pdf_to_jpg, save_upload
+from services import converter, download_zip, io_executor, max_upload_bytes, save_upload
 
+from .file_table import FileTable
 from .page_header import page_header
 
+UPDATE_INTERVAL = 0.5  # seconds between UI updates from the converter
+
 
 def page_convert():
-    def upload(e):
-        save_path = save_upload(e, Config.CONVERT_DIR)
+    async def upload(e):
+        save_path = await save_upload(e, Config.CONVERT_DIR)
         if save_path:
             # Start conversion
-            convert()
+            await io_executor.run(convert)
 
-            # Refresh processing list
-            refresh_processing_table()
+            # Refresh conversion list
+            refresh_conversion_table()
 
     def convert():
         """
-        Processes all PDF files from the Config.CONVERT directory and converts them to JPG.
+        Queues all PDF files from the Config.CONVERT directory for conversion to JPG.
         """
         input_dir = Path(Config.CONVERT_DIR)
 
-        pdf_files = list(input_dir.glob("*.pdf"))
+        pdf_files = [str(pdf) for pdf in input_dir.glob("*.pdf")]
         if not pdf_files:
             logging.info(f"No PDF files found in {input_dir}")
             return
 
-        for pdf in pdf_files:
-            try:
-                logging.info(f"Converting: {pdf}")
-                pdf_to_jpg(str(pdf), output_dir=Config.CONVERT_DIR)
-                os.remove(pdf)
-            except Exception as e:
-                logging.warning(f"Error converting {pdf}: {e}")
+        converter.add_files(pdf_files)
 
-    def refresh_processing_table():
-        # Get files
-        files = get_file_list(dir=Config.CONVERT_DIR)
+    def refresh_conversion_table():
+        conversion_table.rows = converter.get_rows()
+        conversion_table.update()
 
-        # Sort alphabetically by file name
-        files_sorted = sorted(files, key=lambda f: f["name"].lower())
+    def refresh_processing_table():
+        # Reload the visible page of images
+        image_files.refresh()
 
-        # Add numbering column
-        rows = []
-        for file in files_sorted:
-            rows.append({"name": file["name"], "size": file["size"]})
+    def apply_updates():
+        """Apply conversion progress collected since the last tick"""
+        if subscription.take():
+            refresh_conversion_table()
+        # Images appear as pages are rendered
+        image_files.refresh_if_changed()
 
-        # Update table data
-        processing_table.rows = rows
-        processing_table.update()
+    # Subscribe to conversion progress for as long as this client exists
+    subscription = converter.bus.subscribe()
+    ui.context.client.on_delete(lambda: converter.bus.unsubscribe(subscription))
 
     page_header(title="PDF to Image")
     with ui.column().classes("page_column"):
         ui.label("Drop box").classes("label-header upload_label")
-        ui.upload(on_upload=upload, auto_upload=True, multiple=True).props("accept=.pdf").classes("upload_flield")
+        ui.upload(on_upload=upload, auto_upload=True, multiple=True, max_file_size=max_upload_bytes() or None).props("accept=.pdf").classes("upload_flield")
 
-        ui.label("Image list").classes("label-header table_processing_label")
-        processing_table = ui.table(
+        ui.label("Conversion list").classes("label-header table_processing_label")
+        conversion_table = ui.table(
             columns=[
                 {"name": "name", "label": "File name", "field": "name", "align": "left"},
-                {"name": "size", "label": "Size", "field": "size", "align": "right"},
+                {"name": "status", "label": "Status", "field": "status", "align": "left"},
+                {"name": "progress", "label": "Pages", "field": "progress", "align": "right"},
             ],
             rows=[],
-            row_key="name"
+            row_key="path"
         ).classes("status_table")
 
+        ui.label("Image list").classes("label-header table_processing_label")
+        image_files = FileTable(
+            Config.CONVERT_DIR,
+            columns=[
+                {"name": "name", "label": "File name", "field": "name", "align": "left", "sortable": True},
+                {"name": "size", "label": "Size", "field": "size", "align": "right", "sortable": True},
+            ],
+            row_map=lambda file, position: {"name": file["name"], "size": file["size"]},
+        )
+        image_files.table.classes("status_table")
+
         with ui.row().classes("w-full"):
             ui.space()
             ui.button("Download All", icon="download", color="primary", on_click=lambda: download_zip(dir=Config.CONVERT_DIR))
 
+    refresh_conversion_table()
     refresh_processing_table()
+    ui.timer(UPDATE_INTERVAL, apply_updates)
@@ -31,6 +31,10 @@ def page_header(title):
                         ui.label("🖼️").classes("icon")
                         ui.label("PDF to Image")
 
+                    with ui.link(target="/stats").classes("nav-button"):
+                        ui.label("📊").classes("icon")
+                        ui.label("Stats")
+
                     with ui.link(target="/settings").classes("nav-button settings-button"):
                         ui.label("⚙️").classes("icon")
                         ui.label("Settings")
@@ -2,65 +2,147 @@ import logging
 import os
 
 from config import Config
-from nicegui import ui
-from services import clear_all_data, download_zip, get_file_list, image_to_pdf, processor, save_upload
+from nicegui import app, ui
+from services import clear_all_data, download_zip, image_to_pdf, io_executor, max_upload_bytes, processor, save_upload
 
+from .file_table import ROWS_PER_PAGE, FileTable
 from .page_header import page_header
 
+UPDATE_INTERVAL = 0.5  # seconds between UI updates from the processor
+
 
 def page_index():
     async def clear_files():
-        clear_all_data()
-        processor.clear_files()
+        await clear_all_data()
+        await io_executor.run(processor.clear_files)
         refresh_processing_table()
         refresh_output_table()
 
+    async def cancel_job(e):
+        if not await io_executor.run(processor.cancel, e.args["id"]):
+            ui.notify(f"{e.args['name']} has already finished")
+
     def refresh_processing_table():
-        processing_table.rows = processor.get_file_list()
-        processing_table.update()
+        processing_rows[:] = processor.get_file_list()  # the snapshot rows are shared, they are replaced not edited
+        show_processing_page()
+
+    def update_processing_rows(job_ids):
+        """Apply row-level changes for the given jobs instead of rebuilding the list"""
+        rows = processing_rows
+        index = {row["id"]: i for i, row in enumerate(rows)}
+        removed = set()
+        for job_id, row in processor.get_rows(job_ids).items():
+            i = index.get(job_id)
+            if row is None:
+                if i is not None:
+                    removed.add(job_id)  # finished or cleared
+            elif i is None:
+                rows.append(row)
+            elif rows[i] != row:
+                rows[i] = row
+        if removed:
+            rows[:] = [row for row in rows if row["id"] not in removed]
+        show_processing_page()
+
+    def show_processing_page(pagination: dict = None):
+        """Send the visible page of the processing list to the browser, only when it changed"""
+        pagination = dict(pagination or processing_table.pagination)
+        per_page = pagination["rowsPerPage"] or len(processing_rows)  # 0 = all rows
+        page = min(max(1, pagination.get("page") or 1), max(1, -(-len(processing_rows) // max(1, per_page))))
+        visible = processing_rows[(page - 1) * per_page:page * per_page]
+        pagination.update(page=page, rowsNumber=len(processing_rows))
+        if visible != processing_table.rows or pagination != processing_table.pagination:
+            processing_table.pagination = pagination
+            processing_table.rows = visible
+            processing_table.update()
+
+    def refresh_backlog_label():
+        backlog = processor.backlog
+        if backlog["finished"]:
+            backlog_label.text = f"Queued: {len(processor.queue)}"
+        else:
+            backlog_label.text = f"Scanning input folder: {backlog['found']} files found, queued: {len(processor.queue)}"
 
     def refresh_output_table():
-        # Refresh output table rows
-        output_table.rows = get_file_list(dir=Config.OUTPUT_DIR)
-        output_table.update()
+        # Reload the visible page of output files
+        output_files.refresh()
 
-    def upload(e):
-        save_path = save_upload(e, Config.INPUT_DIR)
+    def apply_updates():
+        """Apply processor changes collected since the last tick; bursts of notifications coalesce here"""
+        changes = subscription.take()
+        if "jobs" in changes:
+            if changes["jobs"] is None:  # whole list changed
+                refresh_processing_table()
+            else:
+                update_processing_rows(changes["jobs"])
+        if "outputs" in changes:
+            refresh_output_table()
+        else:
+            # The directory index may pick up a new output file after the processor's notification
+            output_files.refresh_if_changed()
+        if changes:
+            refresh_backlog_label()
+
+    async def upload(e):
+        if e.file.name:
+            # Files of this browser get their own share of the workers (fair-share scheduling)
+            processor.set_owner(os.path.join(Config.INPUT_DIR, os.path.basename(e.file.name)), f"session:{browser_id}")
+        save_path = await save_upload(e, Config.INPUT_DIR)
         if save_path:
-            image_to_pdf(save_path)
+            await image_to_pdf(save_path)
 
-    # Register callback
-    processor.subscribe(lambda: (
-        refresh_processing_table(),
-        refresh_output_table()
-    ))
+    # Shared by all tabs of a browser, so more tabs or a reload do not get more shares (the cookie is only
+    # readable while the page is built)
+    browser_id = app.storage.browser["id"]
+
+    processing_rows = []  # the whole processing list; the table shows one page of it
+
+    # Subscribe to processor changes for as long as this client exists
+    subscription = processor.bus.subscribe()
+    ui.context.client.on_delete(lambda: processor.bus.unsubscribe(subscription))
 
     page_header(title="OCR")
     with ui.column().classes("page_column"):
         ui.label("Drop box").classes("label-header upload_label")
-        ui.upload(on_upload=upload, auto_upload=True, multiple=True).props(f"accept=.pdf,{','.join(Config.SUPPORTED_IMAGE_EXTENSIONS)}").classes("upload_flield")
+        ui.upload(on_upload=upload, auto_upload=True, multiple=True, max_file_size=max_upload_bytes() or None).props(f"accept=.pdf,{','.join(Config.SUPPORTED_IMAGE_EXTENSIONS)}").classes("upload_flield")
 
         ui.label("Processing list").classes("label-header table_processing_label")
+        backlog_label = ui.label()
         processing_table = ui.table(
             columns=[
                 {"name": "name", "label": "File name", "field": "name", "align": "left"},
                 {"name": "status", "label": "Status", "field": "status", "align": "left"},
-                {"name": "size", "label": "Size", "field": "size", "align": "right"}
+                {"name": "progress", "label": "Progress", "field": "progress", "align": "left"},
+                {"name": "eta", "label": "ETA", "field": "eta", "align": "right"},
+                {"name": "size", "label": "Size", "field": "size", "align": "right"},
+                {"name": "cancel", "label": "", "field": "id", "align": "center"}
             ],
             rows=[],
-            row_key="name"
+            row_key="id",
+            # Paged on the server like the download table: progress ticks only send the visible rows
+            pagination={"rowsPerPage": ROWS_PER_PAGE, "page": 1, "rowsNumber": 0},
         ).classes("status_table")
+        processing_table.on("request", lambda e: show_processing_page(e.args["pagination"]))
+
+        # Cancel button for queued and running jobs
+        processing_table.add_slot('body-cell-cancel', '''
+            <q-td :props="props">
+                <q-btn v-if="['New', 'Waiting', 'Processing'].includes(props.row.status)" flat round dense
+                       icon="cancel" color="negative" @click="() => $parent.$emit('cancel', props.row)" />
+            </q-td>
+        ''')
+        processing_table.on("cancel", cancel_job)
 
         ui.label("Download").classes("label-header table_finished_label")
-        output_table = ui.table(
+        output_files = FileTable(
+            Config.OUTPUT_DIR,
             columns=[
-                {"name": "name", "label": "File name", "field": "name", "align": "left"},
-                {"name": "size", "label": "Size", "field": "size", "align": "right"},
+                {"name": "name", "label": "File name", "field": "name", "align": "left", "sortable": True},
+                {"name": "size", "label": "Size", "field": "size", "align": "right", "sortable": True},
                 {"name": "download", "label": "Download", "field": "download_url", "align": "center"}
             ],
-            rows=[],
-            row_key="name"
-        ).classes("status_table")
+        )
+        output_table = output_files.table.classes("status_table")
 
         # Add slot for download buttons (formatted without function in template)
         output_table.add_slot('body-cell-download', '''
@@ -79,3 +161,5 @@ def page_index():
     # Refresh tables
     refresh_processing_table()
     refresh_output_table()
+    refresh_backlog_label()
+    ui.timer(UPDATE_INTERVAL, apply_updates)
@@ -5,45 +5,26 @@ from pathlib import Path
 
 from config import Config
 from nicegui import ui
-from PyPDF2 import PdfMerger
-from services import get_file_list, image_to_pdf, move_files, save_upload
+from services import cpu_executor, get_file_list, image_to_pdf, io_executor, max_upload_bytes, merge_pdfs, move_files, save_upload
 
+from .file_table import FileTable
 from .page_header import page_header
 
 
 def page_merge():
     output_filename = "Combined_document.pdf"
 
-    def upload(e):
-        save_path = save_upload(e, Config.MERGE_DIR)
+    async def upload(e):
+        save_path = await save_upload(e, Config.MERGE_DIR)
         if save_path:
-            image_to_pdf(save_path)
+            await image_to_pdf(save_path)
             refresh_processing_table()
 
     def refresh_processing_table():
-        # Get files
-        files = get_file_list(dir=Config.MERGE_DIR)
+        # Reload the visible page of the merge list (files are merged in name order)
+        merge_files.refresh()
 
-        # filter out unwanted file by name
-        # files = [f for f in files if f["name"] != output_filename]
-
-        # Sort alphabetically by file name
-        files_sorted = sorted(files, key=lambda f: f["name"].lower())
-
-        # Add numbering column
-        rows = []
-        for i, file in enumerate(files_sorted, start=1):
-            rows.append({
-                "index": i,             # new column with row number
-                "name": file["name"],
-                "size": file["size"]
-            })
-
-        # Update table data
-        processing_table.rows = rows
-        processing_table.update()
-
-    def merge():
+    async def merge():
         try:
             files = get_file_list(dir=Config.MERGE_DIR)
             pdf_files = sorted(
@@ -56,23 +37,14 @@ def page_merge():
 
             output_path = os.path.join(Config.MERGE_DIR, output_filename)
 
-            merger = PdfMerger()
-            for pdf in pdf_files:
-                merger.append(pdf)
-            merger.write(output_path)
-            merger.close()
+            await cpu_executor.run(merge_pdfs, pdf_files, output_path)
 
             msg = f"Merged {len(pdf_files)} files into {output_filename}"
             logging.info(msg)
             ui.notify(msg, type="positive")
 
             # Delete processed PDFs
-            for pdf in pdf_files:
-                try:
-                    os.remove(pdf)
-                    logging.info(f"Deleted source file: {pdf}")
-                except Exception as e:
-                    logging.error(f"Failed to delete {pdf}: {e}")
+            await io_executor.run(delete_files, pdf_files)
 
             refresh_processing_table()
 
@@ -80,6 +52,14 @@ def page_merge():
             logging.error(f"Error during PDF merge: {e}")
             ui.notify(f"Error: {e}", type="negative")
 
+    def delete_files(pdf_files):
+        for pdf in pdf_files:
+            try:
+                os.remove(pdf)
+                logging.info(f"Deleted source file: {pdf}")
+            except Exception as e:
+                logging.error(f"Failed to delete {pdf}: {e}")
+
     def download():
         file_path = Path(Config.MERGE_DIR) / output_filename
 
@@ -97,8 +77,8 @@ def page_merge():
             logging.error(msg)
             ui.notify(msg, type="negative")
 
-    def move_to_ocr():
-        filelist = move_files(src_dir=Config.MERGE_DIR, dst_dir=Config.INPUT_DIR, extension=".pdf")
+    async def move_to_ocr():
+        filelist = await io_executor.run(move_files, src_dir=Config.MERGE_DIR, dst_dir=Config.INPUT_DIR, extension=".pdf")
         if len(filelist) == 0:
             ui.notify("No PDF files to move", type="warning")
         else:
@@ -107,18 +87,20 @@ def page_merge():
     page_header(title="Merge")
     with ui.column().classes("page_column"):
         ui.label("Drop box").classes("label-header upload_label")
-        ui.upload(on_upload=upload, auto_upload=True, multiple=True).props(f"accept=.pdf,{','.join(Config.SUPPORTED_IMAGE_EXTENSIONS)}").classes("upload_flield")
+        ui.upload(on_upload=upload, auto_upload=True, multiple=True, max_file_size=max_upload_bytes() or None).props(f"accept=.pdf,{','.join(Config.SUPPORTED_IMAGE_EXTENSIONS)}").classes("upload_flield")
 
         ui.label("Merge list").classes("label-header table_processing_label")
-        processing_table = ui.table(
+        merge_files = FileTable(
+            Config.MERGE_DIR,
             columns=[
                 {"name": "index", "label": "Order", "field": "index", "align": "center"},
                 {"name": "name", "label": "File name", "field": "name", "align": "left"},
                 {"name": "size", "label": "Size", "field": "size", "align": "right"},
             ],
-            rows=[],
-            row_key="name"
-        ).classes("status_table")
+            # Numbering column continues across pages
+            row_map=lambda file, position: {"index": position, "name": file["name"], "size": file["size"]},
+        )
+        merge_files.table.classes("status_table")
 
         with ui.row().classes("w-full"):
             ui.button("Merge", icon="merge_type", color="primary", on_click=merge)
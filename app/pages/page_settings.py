@@ -1,6 +1,6 @@
 from config import Config
 from nicegui import ui
-from services import get_langs
+from services import converter, format_size, get_langs, io_executor, processor
 
 from .page_header import page_header
 
@@ -16,10 +16,32 @@ def page_settings():
         language_input = ui.input("Language (e.g., pol, eng)", value=Config.language).classes("input_field")
         dpi_input = ui.number("Image DPI", value=Config.image_dpi, min=72, max=600).classes("input_field")
         optimize_input = ui.number("Optimization (0-3)", value=Config.optimize, min=0, max=3).classes("input_field")
-        max_workers_input = ui.number("Max parallel processes", value=Config.max_workers, min=0, max=10).classes("input_field")
+        max_workers_input = ui.number("Max parallel processes", value=Config.max_workers, min=0, max=64).classes("input_field")
+        cpu_cores_input = ui.number("CPU cores for OCR (0 = all)", value=Config.cpu_cores, min=0, max=256).classes("input_field")
+        page_timeout_input = ui.number("OCR timeout without progress in seconds (0 = off)", value=Config.ocr_page_timeout, min=0).classes("input_field")
+        job_timeout_input = ui.number("OCR timeout per run in seconds (0 = off)", value=Config.ocr_job_timeout, min=0).classes("input_field")
+        shard_pages_input = ui.number("Split PDFs above this many pages (0 = off)", value=Config.shard_pages, min=0).classes("input_field")
+        shard_chunk_input = ui.number("Pages per split chunk", value=Config.shard_chunk_pages, min=1).classes("input_field")
+        batch_size_input = ui.number("Small PDFs per OCR batch (1 = off)", value=Config.batch_size, min=1, max=100).classes("input_field")
+        batch_pages_input = ui.number("Max pages of a small PDF", value=Config.batch_small_pages, min=1).classes("input_field")
+        batch_wait_input = ui.number("Max wait for a batch (s)", value=Config.batch_max_wait, min=0, step=0.5).classes("input_field")
+        schedule_input = ui.select({"fifo": "First in, first out", "sjf": "Shortest job first", "fair": "Fair share between uploaders"},
+                                   value=Config.schedule_policy, label="Scheduling").classes("input_field")
+        aging_input = ui.number("Priority gained per minute of waiting (pages)", value=Config.schedule_aging, min=0).classes("input_field")
+        session_weight_input = ui.number("Share of an upload session vs. the input folder", value=Config.schedule_session_weight, min=0.1, step=0.5).classes("input_field")
+        cache_input = ui.number("OCR result cache size in MB (0 = off)", value=Config.cache_max_mb, min=0).classes("input_field")
+        convert_workers_input = ui.number("Parallel PDF-to-image conversions (0 = all cores)", value=Config.convert_workers, min=0, max=256).classes("input_field")
+        convert_window_input = ui.number("Pages per PDF-to-image step", value=Config.convert_window_pages, min=1).classes("input_field")
+        digests_input = ui.checkbox("Send SHA-256 digests with downloads", value=Config.download_digests)
+        upload_max_input = ui.number("Max upload size in MB (0 = unlimited)", value=Config.upload_max_mb, min=0).classes("input_field")
+        keep_jobs_input = ui.number("Finished jobs kept in the list", value=Config.keep_finished_jobs, min=0).classes("input_field")
+        keep_hours_input = ui.number("Hours finished jobs are kept", value=Config.keep_finished_hours, min=0).classes("input_field")
+        cache_stats = processor.cache.stats()
+        ui.label(f"Cache: {cache_stats['entries']} files, {format_size(cache_stats['size'])}, "
+                 f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
 
         # Function to save changes
-        def save_handler():
+        async def save_handler():
             selected_lang = language_input.value.strip()
 
             # --- check if selected language is valid ---
@@ -31,7 +53,36 @@ def page_settings():
             Config.image_dpi = int(dpi_input.value)
             Config.optimize = int(optimize_input.value)
             Config.max_workers = int(max_workers_input.value)
-            Config.save_config()
+            Config.cpu_cores = int(cpu_cores_input.value)
+            Config.ocr_page_timeout = float(page_timeout_input.value)
+            Config.ocr_job_timeout = float(job_timeout_input.value)
+            Config.shard_pages = int(shard_pages_input.value)
+            Config.shard_chunk_pages = int(shard_chunk_input.value)
+            Config.batch_size = int(batch_size_input.value)
+            Config.batch_small_pages = int(batch_pages_input.value)
+            Config.batch_max_wait = float(batch_wait_input.value)
+            Config.schedule_policy = schedule_input.value
+            Config.schedule_aging = float(aging_input.value)
+            Config.schedule_session_weight = float(session_weight_input.value)
+            Config.cache_max_mb = int(cache_input.value)
+            Config.convert_workers = int(convert_workers_input.value)
+            Config.convert_window_pages = int(convert_window_input.value)
+            Config.upload_max_mb = int(upload_max_input.value)
+            Config.download_digests = bool(digests_input.value)
+            Config.keep_finished_jobs = int(keep_jobs_input.value)
+            Config.keep_finished_hours = float(keep_hours_input.value)
+            # Off the event loop: evicting cache entries and closing surplus OCR workers can take seconds
+            await io_executor.run(apply_settings)
             ui.notify("Settings saved", type="positive")
 
+        def apply_settings():
+            Config.save_config()
+            processor.cache.resize(Config.cache_max_mb)
+            processor.cores.resize(Config.cpu_cores)
+            processor.engine.configure(Config.worker_max_jobs, Config.worker_max_memory_mb, Config.ocr_page_timeout,
+                                       Config.ocr_job_timeout)
+            processor.resize_workers(Config.max_workers)
+            processor.configure_scheduling()
+            converter.resize(Config.convert_workers)
+
         ui.button("Save", on_click=save_handler)
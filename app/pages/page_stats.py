@@ -0,0 +1,105 @@
+from nicegui import ui
+from services import Status, files_done, io_executor, ocr_run_seconds, pages_done, processor, queue_wait_seconds
+
+from .page_header import page_header
+
+UPDATE_INTERVAL = 2.0  # seconds between refreshes of the figures
+RECENT_JOBS = 20
+
+
+def format_seconds(value) -> str:
+    return "-" if value is None else f"{value:.1f} s"
+
+
+def page_stats():
+    def refresh_figures():
+        counts = processor.counts()
+        throughput_label.text = f"Throughput (last 5 min): {pages_done.per_minute():.1f} pages/min, {files_done.per_minute():.1f} files/min"
+        backlog_label.text = (f"Backlog: {len(processor.queue)} queued, {counts[Status.PROCESSING]} processing, "
+                              f"{processor.pool.size} workers, {processor.queue.policy} scheduling")
+        wait, run = queue_wait_seconds.stats(), ocr_run_seconds.stats(result="ok")
+        timing_label.text = (f"Average queue wait: {format_seconds(wait['avg'] if wait['count'] else None)}, "
+                             f"average OCR run: {format_seconds(run['avg'] if run['count'] else None)} ({run['count']} runs)")
+
+    def refresh_nodes():
+        nodes_table.rows = [{
+            "node": info["node"],
+            "state": "online" if info["alive"] else "offline",
+            "heartbeat": f"{info['age']:.0f} s ago",
+            "workers": info.get("workers", "-"),
+            "processing": info.get("processing", "-"),
+            "pages_per_minute": info.get("pages_per_minute", "-"),
+            "files_per_minute": info.get("files_per_minute", "-"),
+            "pages_total": info.get("pages_total", "-"),
+        } for info in processor.coordinator.nodes()]
+        nodes_table.update()
+
+    async def refresh_jobs():
+        history = await io_executor.run(processor.journal.history, RECENT_JOBS) if processor.journal else []
+        rows = []
+        for job in history:
+            timings = job["timings"] or {}
+            rows.append({
+                "id": job["id"],
+                "name": job["name"],
+                "status": job["status"].capitalize(),
+                "queue_wait": format_seconds(timings.get("queue_wait_s")),
+                "ocr": format_seconds(timings.get("ocr_s")),
+                "cpu": format_seconds(timings.get("cpu_s")),
+                "rss": f"{timings['peak_rss_kb'] // 1024} MB" if timings.get("peak_rss_kb") else "-",
+                "pages_per_s": timings.get("pages_per_s") or "-",
+                "size_ratio": timings.get("size_ratio") or "-",
+            })
+        jobs_table.rows = rows
+        jobs_table.update()
+
+    async def refresh():
+        refresh_figures()
+        if processor.coordinator:
+            refresh_nodes()
+        await refresh_jobs()
+
+    page_header(title="Statistics")
+    with ui.column().classes("page_column"):
+        throughput_label = ui.label()
+        backlog_label = ui.label()
+        timing_label = ui.label()
+        ui.link("Prometheus metrics", "/metrics", new_tab=True)
+
+        if processor.coordinator:
+            ui.label(f"Nodes (this is {processor.coordinator.name})").classes("label-header")
+            nodes_table = ui.table(
+                columns=[
+                    {"name": "node", "label": "Node", "field": "node", "align": "left"},
+                    {"name": "state", "label": "State", "field": "state", "align": "left"},
+                    {"name": "heartbeat", "label": "Heartbeat", "field": "heartbeat", "align": "right"},
+                    {"name": "workers", "label": "Workers", "field": "workers", "align": "right"},
+                    {"name": "processing", "label": "Processing", "field": "processing", "align": "right"},
+                    {"name": "pages_per_minute", "label": "Pages/min", "field": "pages_per_minute", "align": "right"},
+                    {"name": "files_per_minute", "label": "Files/min", "field": "files_per_minute", "align": "right"},
+                    {"name": "pages_total", "label": "Pages", "field": "pages_total", "align": "right"},
+                ],
+                rows=[],
+                row_key="node"
+            ).classes("status_table")
+
+        ui.label("Recently finished").classes("label-header")
+        jobs_table = ui.table(
+            columns=[
+                {"name": "name", "label": "File name", "field": "name", "align": "left"},
+                {"name": "status", "label": "Status", "field": "status", "align": "left"},
+                {"name": "queue_wait", "label": "Queue wait", "field": "queue_wait", "align": "right"},
+                {"name": "ocr", "label": "OCR", "field": "ocr", "align": "right"},
+                {"name": "cpu", "label": "CPU", "field": "cpu", "align": "right"},
+                {"name": "rss", "label": "Peak memory", "field": "rss", "align": "right"},
+                {"name": "pages_per_s", "label": "Pages/s", "field": "pages_per_s", "align": "right"},
+                {"name": "size_ratio", "label": "Size ratio", "field": "size_ratio", "align": "right"},
+            ],
+            rows=[],
+            row_key="id"
+        ).classes("status_table")
+
+    refresh_figures()
+    if processor.coordinator:
+        refresh_nodes()
+    ui.timer(UPDATE_INTERVAL, refresh)
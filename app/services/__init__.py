@@ -1,3 +1,13 @@
+from .dir_index import start_indexes
 from .directory_watcher import DirectoryWatcher
-from .functions import apply_nicegui_patch, clear_all_data, download_zip, get_file_list, get_langs, image_to_pdf, move_files, pdf_to_jpg, save_upload
+from .downloads import digests, download_timing, file_download
+from .executor import cpu_executor, io_executor
+from .functions import apply_nicegui_patch, clear_all_data, convert_image, download_zip, format_size, get_file_list, get_file_page, get_langs, get_listing_version, image_to_pdf, merge_pdfs, move_files, pdf_to_jpg, save_upload
+from .job import Status
+from .metrics import files_done, ocr_run_seconds, pages_done, queue_wait_seconds, registry
+from .node_coordinator import NodeCoordinator
+from .pdf_converter import converter
 from .processor import processor
+from .publish import purge_stale
+from .uploads import UploadError, max_upload_bytes, parse_content_range, safe_filename, upload_offset, write_upload_chunk
+from .zip_stream import iter_zip
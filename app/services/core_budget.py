@@ -0,0 +1,48 @@
+import logging
+import os
+import threading
+
+
+def available_cores() -> int:
+    """Return the number of CPU cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class CoreBudget:
+    """Shares the machine's CPU cores between concurrently running OCR jobs"""
+
+    def __init__(self, total: int = 0):
+        """
+        :param total: number of cores to hand out (0 = all available cores)
+        """
+        self._lock = threading.Lock()
+        self.total = total or available_cores()
+        self.in_use = 0
+
+    def resize(self, total: int):
+        """Change the size of the budget (0 = all available cores)"""
+        with self._lock:
+            self.total = total or available_cores()
+        logging.info(f"Core budget set to {self.total}")
+
+    def acquire(self, demand: int) -> int:
+        """
+        Reserve cores for one job and return the share.
+
+        :param demand: number of jobs currently competing for cores (including this one)
+        A job gets an equal part of the budget, limited to what is still free,
+        but never less than one core so a worker never sits idle.
+        """
+        with self._lock:
+            free = self.total - self.in_use
+            share = max(1, min(free, self.total // max(1, demand)))
+            self.in_use += share
+            return share
+
+    def release(self, share: int):
+        """Return cores of a finished job; the next job to start picks them up"""
+        with self._lock:
+            self.in_use -= share
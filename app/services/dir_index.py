@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+SORT_KEYS = {
+    "name": lambda item: item[0].lower(),
+    "size": lambda item: item[1][0],
+    "mtime": lambda item: item[1][1],
+}
+
+
+class DirectoryIndex(FileSystemEventHandler):
+    """In-memory listing of one directory (name -> size, mtime), kept current by filesystem events"""
+
+    def __init__(self, path: str):
+        self.path = os.path.normpath(path)
+        self._lock = threading.Lock()
+        self._files = {}  # name -> (size, mtime)
+        self._sorted = {}  # sort key -> names in ascending order, rebuilt after changes
+        self.version = 0  # incremented on every change, lets readers skip unchanged refreshes
+
+    @staticmethod
+    def _visible(name: str) -> bool:
+        # Dotfiles are temporary files of work in progress
+        return not name.startswith(".")
+
+    def scan(self):
+        """Rebuild the index from disk"""
+        files = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file() and self._visible(entry.name):
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            if files == self._files:
+                return
+            self._files = files
+            self._sorted.clear()
+            self.version += 1
+
+    def _update(self, path: str):
+        if os.path.dirname(path) != self.path:
+            return
+        name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+            entry = (stat.st_size, stat.st_mtime) if os.path.isfile(path) and self._visible(name) else None
+        except OSError:
+            entry = None
+        with self._lock:
+            if entry is None:
+                if self._files.pop(name, None) is None:
+                    return
+            elif self._files.get(name) != entry:
+                self._files[name] = entry
+            else:
+                return
+            self._sorted.clear()
+            self.version += 1
+
+    def on_created(self, event):
+        self._update(event.src_path)
+
+    def on_modified(self, event):
+        self._update(event.src_path)
+
+    def on_closed(self, event):
+        self._update(event.src_path)
+
+    def on_deleted(self, event):
+        self._update(event.src_path)
+
+    def on_moved(self, event):
+        self._update(event.src_path)
+        self._update(event.dest_path)
+
+    def _names(self, sort_by: str) -> list:
+        """Names sorted by `sort_by` (caller holds the lock)"""
+        if sort_by not in self._sorted:
+            items = sorted(self._files.items(), key=SORT_KEYS.get(sort_by, SORT_KEYS["name"]))
+            self._sorted[sort_by] = [name for name, _ in items]
+        return self._sorted[sort_by]
+
+    def page(self, offset: int = 0, limit: int = None, sort_by: str = "name", descending: bool = False):
+        """
+        Return one page of the listing.
+
+        :return: (list of (name, size, mtime), total number of files)
+        """
+        with self._lock:
+            names = self._names(sort_by)
+            total = len(names)
+            if offset >= total:
+                selected = []
+            elif descending:
+                start = max(0, total - offset - (limit if limit is not None else total))
+                selected = names[start:total - offset][::-1]
+            else:
+                selected = names[offset:None if limit is None else offset + limit]
+            return [(name, *self._files[name]) for name in selected], total
+
+    def __len__(self):
+        return len(self._files)
+
+
+# Indexes of directories served to the UI, keyed by normalized path
+indexes = {}
+_observer = None
+
+
+def start_indexes(dirs: list, rescan_seconds: float = 0):
+    """
+    Index the given directories and keep them current with one shared observer.
+    With rescan_seconds, they are also scanned again periodically, for changes made by other machines.
+    """
+    global _observer
+    _observer = Observer()
+    for path in dirs:
+        index = DirectoryIndex(path)
+        _observer.schedule(index, index.path, recursive=False)
+        indexes[index.path] = index
+    # Observer first, so no change between the scan and the first event is lost
+    _observer.start()
+    for index in indexes.values():
+        index.scan()
+        logging.info(f"Indexed {len(index)} files in {index.path}")
+    if rescan_seconds > 0:
+        threading.Thread(target=_rescan, args=(rescan_seconds,), daemon=True, name="IndexRescan").start()
+
+
+def _rescan(interval: float):
+    while True:
+        time.sleep(interval)
+        for index in list(indexes.values()):
+            try:
+                index.scan()
+            except OSError as e:
+                logging.error(f"Rescan of {index.path} failed: {e}")
+
+
+def get_index(path: str):
+    """Return the DirectoryIndex of a directory, or None when it is not indexed"""
+    return indexes.get(os.path.normpath(path))
@@ -1,37 +1,200 @@
 import logging
 import os
+import threading
+import time
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from .metrics import input_settle_seconds
+
 
 class DirectoryWatcher(FileSystemEventHandler):
-    def __init__(self, path: str, on_new_file):
+    def __init__(self, path: str, on_new_file, on_new_files=None, on_scan_progress=None, scan_batch_size=500,
+                 stable_seconds=2.0, close_settle_seconds=0.5, rescan_seconds=0):
         """
         :param path: directory path to watch
-        :param on_new_file: callback function(file_path: str)
+        :param on_new_file: callback function(file_path: str), called once the file is fully written
+        :param on_new_files: optional callback function(file_paths: list) for batches of existing files
+        :param on_scan_progress: optional callback function(found: int, finished: bool)
+        :param scan_batch_size: number of existing files handed over per batch
+        :param stable_seconds: how long size and mtime must stay unchanged when no close event arrives
+        :param close_settle_seconds: how long a file must stay unchanged after a close event, in case the
+            writer reopens it to append
+        :param rescan_seconds: list the directory again this often (0 = never), for files written by other
+            machines on a network filesystem, which raise no events here
         """
         self.path = path
         self.on_new_file = on_new_file
-        self.observer = Observer()
+        self.on_new_files = on_new_files or (lambda paths: [on_new_file(p) for p in paths])
+        self.on_scan_progress = on_scan_progress or (lambda found, finished: None)
+        self.scan_batch_size = scan_batch_size
+        self.stable_seconds = stable_seconds
+        self.close_settle_seconds = close_settle_seconds
+        self.rescan_seconds = rescan_seconds
+        try:
+            # inotify: a file renamed in from another directory arrives as a move (ready at once),
+            # not as a created file that would wait out stable_seconds
+            self.observer = Observer(generate_full_events=True)
+        except TypeError:
+            self.observer = Observer()  # other platforms
+        # Files still being written: path -> (size, mtime, unchanged since, seconds to stay unchanged)
+        self._pending = {}
+        self._first_seen = {}  # path -> time of its first event, for the settle time metric
+        self._pending_cond = threading.Condition()
 
     def on_created(self, event):
-        """Triggered when a file or folder is created."""
+        """Triggered when a file or folder is created; the file may still be written to."""
+        if not event.is_directory:
+            self._track(event.src_path)
+
+    def on_modified(self, event):
+        """Triggered on writes; (re)starts the stability window of the file."""
         if not event.is_directory:
-            self.on_new_file(event.src_path)
+            self._track(event.src_path)
+
+    def on_closed(self, event):
+        """Triggered when a file opened for writing is closed: the writer is done unless it reopens the file soon."""
+        if not event.is_directory:
+            self._track(event.src_path, self.close_settle_seconds)
+
+    def on_moved(self, event):
+        """Triggered on renames, also from or to other directories; a file moved into the directory is complete."""
+        if event.is_directory:
+            return
+        self._forget(event.src_path)
+        if os.path.dirname(event.dest_path) == os.path.normpath(self.path):
+            self._ready(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._forget(event.src_path)
+
+    @staticmethod
+    def _ignored(path: str) -> bool:
+        """Dotfiles are temporary files of uploads in progress"""
+        return os.path.basename(path).startswith(".")
+
+    def _track(self, path: str, wait: float = None):
+        """
+        Wait for a file to stay unchanged for `wait` seconds, stable_seconds by default
+        (used when no close event arrives, e.g. network filesystems).
+        """
+        if self._ignored(path):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return
+        with self._pending_cond:
+            self._first_seen.setdefault(path, time.monotonic())
+        now = time.time()
+        # Files moved in from elsewhere show up as created but were last written long ago
+        if stat.st_size > 0 and now - stat.st_mtime >= self.stable_seconds:
+            self._ready(path)
+            return
+        with self._pending_cond:
+            self._pending[path] = (stat.st_size, stat.st_mtime, time.monotonic(),
+                                   self.stable_seconds if wait is None else wait)
+            self._pending_cond.notify()
+
+    def _forget(self, path: str):
+        with self._pending_cond:
+            self._pending.pop(path, None)
+            self._first_seen.pop(path, None)
+
+    def _ready(self, path: str):
+        """Hand a fully written file to the callback."""
+        first_seen = self._first_seen.get(path)
+        self._forget(path)
+        if first_seen is not None:
+            input_settle_seconds.observe(time.monotonic() - first_seen)
+        if self._ignored(path) or not os.path.isfile(path):
+            return
+        try:
+            self.on_new_file(path)
+        except Exception as e:
+            logging.error(f"Error handling {path}: {e}")
+
+    def _watch_pending(self):
+        """Emit tracked files once their size and mtime stayed unchanged for stable_seconds."""
+        while True:
+            with self._pending_cond:
+                self._pending_cond.wait_for(lambda: self._pending)
+                # Sleeps only while some file is still being written
+                self._pending_cond.wait(min(self.stable_seconds, self.close_settle_seconds) / 4)
+                pending = dict(self._pending)
+
+            now = time.monotonic()
+            for path, (size, mtime, since, wait) in pending.items():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    self._forget(path)
+                    continue
+                if (stat.st_size, stat.st_mtime) != (size, mtime):
+                    with self._pending_cond:
+                        if path in self._pending:
+                            self._pending[path] = (stat.st_size, stat.st_mtime, now, self.stable_seconds)
+                elif now - since >= wait:
+                    if stat.st_size > 0:
+                        self._ready(path)
+                    else:
+                        logging.warning(f"Ignoring empty file: {path}")
+                        self._forget(path)
 
     def start(self):
-        """Start watching the directory."""
-        # Handle already existing files
-        for filename in os.listdir(self.path):
-            filepath = os.path.join(self.path, filename)
-            if os.path.isfile(filepath):
-                self.on_new_file(filepath)
+        """Start watching the directory, then pick up already existing files in the background."""
+        threading.Thread(target=self._watch_pending, daemon=True, name="WriteCompletion").start()
 
+        # Observer first, so files arriving during the backlog scan are not missed
         self.observer.schedule(self, self.path, recursive=False)
         self.observer.start()
         logging.info(f"Started watching: {self.path}")
 
+        threading.Thread(target=self._scan_existing, daemon=True, name="BacklogScan").start()
+
+    def _scan_existing(self):
+        """Stream files already present in the directory to on_new_files in batches, then rescan if configured."""
+        found = self._scan(self.on_scan_progress)
+        logging.info(f"Backlog scan of {self.path} finished: {found} files")
+        while self.rescan_seconds > 0:
+            time.sleep(self.rescan_seconds)
+            self._scan(lambda found, finished: None, rescan=True)
+
+    def _scan(self, on_progress, rescan: bool = False) -> int:
+        """
+        Hand the files in the directory to on_new_files, reporting progress to on_progress(found, finished).
+        A rescan skips empty files, which the first scan already reported.
+        """
+        found = 0
+        batch = []
+        on_progress(found, False)
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if not entry.is_file() or self._ignored(entry.path):
+                        continue
+                    found += 1
+                    stat = entry.stat()
+                    if rescan and stat.st_size == 0:
+                        continue
+                    if stat.st_size == 0 or time.time() - stat.st_mtime < self.stable_seconds:
+                        self._track(entry.path)  # possibly still being copied in
+                        continue
+                    batch.append(entry.path)
+                    if len(batch) >= self.scan_batch_size:
+                        self.on_new_files(batch)
+                        batch = []
+                        on_progress(found, False)
+            if batch:
+                self.on_new_files(batch)
+        except Exception as e:
+            logging.error(f"Scan of {self.path} failed: {e}")
+        on_progress(found, True)
+        return found
+
     def stop(self):
         """Stop watching."""
         self.observer.stop()
@@ -0,0 +1,118 @@
+import base64
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+
+from config import Config
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response
+
+from .metrics import download_seconds
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Strong ETag from size and modification time; published files are never modified in place"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)"""
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _not_modified_since(header: str, stat: os.stat_result) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat.st_mtime) <= since
+
+
+class DigestCache:
+    """SHA-256 digests of published files, computed in the background and keyed by size and mtime"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._digests = {}  # path -> (size, mtime_ns, base64 digest)
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(1, "FileDigest")
+
+    def get(self, path: str, stat: os.stat_result):
+        """Digest of the file in its current state, or None (then it is computed for the next request)"""
+        with self._lock:
+            entry = self._digests.get(path)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        self.schedule(path)
+        return None
+
+    def schedule(self, path: str):
+        """Compute the digest of a file in the background"""
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._executor.submit(self._compute, path)
+
+    def _compute(self, path: str):
+        try:
+            stat = os.stat(path)
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+            entry = (stat.st_size, stat.st_mtime_ns, base64.b64encode(digest.digest()).decode())
+            with self._lock:
+                self._digests[path] = entry
+        except OSError as e:
+            logging.warning(f"Could not hash {path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+
+digests = DigestCache()
+
+
+def download_timing(kind: str) -> BackgroundTask:
+    """Response background task observing the download duration once the last byte was sent"""
+    start = time.perf_counter()
+    return BackgroundTask(lambda: download_seconds.observe(time.perf_counter() - start, kind=kind))
+
+
+def file_download(path: str, filename: str, request_headers) -> Response:
+    """
+    Response for downloading a file, with validators for conditional requests:
+    304 when the client's copy is current, byte ranges (206) for resumed transfers.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",  # cache, but revalidate: names are reused after clearing
+    }
+    if Config.download_digests:
+        digest = digests.get(path, stat)
+        if digest:
+            headers["Repr-Digest"] = f"sha-256=:{digest}:"
+
+    if "if-none-match" in request_headers:
+        if _etag_matches(request_headers["if-none-match"], etag):
+            return Response(status_code=304, headers=headers)
+    elif "if-modified-since" in request_headers:
+        if _not_modified_since(request_headers["if-modified-since"], stat):
+            return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    # FileResponse serves Range requests (checking If-Range against these validators)
+    return FileResponse(path=path, filename=filename, media_type=media_type, headers=headers, stat_result=stat,
+                        background=download_timing("file"))
@@ -0,0 +1,38 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .core_budget import available_cores
+
+
+class Executor:
+    """
+    Runs blocking work of UI handlers in a thread pool, off the event loop.
+    At most `max_pending` calls are admitted at a time; further callers wait
+    (without blocking the loop) until a slot frees up.
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self._pool = ThreadPoolExecutor(workers, name)
+        self._slots = asyncio.Semaphore(max_pending)
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new call would have to wait for a free slot"""
+        return self._slots.locked()
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in the pool and return its result"""
+        if self.saturated:
+            logging.info(f"{self.name} executor saturated, waiting for a free slot")
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+
+
+# File copies, deletions and directory scans
+io_executor = Executor("IO", workers=8, max_pending=64)
+# Image conversion and PDF merging
+cpu_executor = Executor("CPU", workers=available_cores(), max_pending=available_cores() * 4)
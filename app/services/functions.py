@@ -1,20 +1,24 @@
-import io
 import logging
 import os
 import shutil
 import subprocess
-import zipfile
-from datetime import datetime
-from pathlib import Path
 
 import img2pdf
 import nicegui.client
 from config import Config
 from nicegui import ui
-from pdf2image import convert_from_path
+from PyPDF2 import PdfMerger
 
+from .dir_index import DirectoryIndex, get_index
+from .executor import cpu_executor, io_executor
+from .metrics import convert_seconds, merge_seconds
+from .pdf_render import render_pages
+from .pdf_shards import count_pages
+from .publish import published
+from .uploads import UploadError, stream_upload
 
-def save_upload(e, path):
+
+async def save_upload(e, path):
     if not e or not e.file.name:
         ui.notify("No file selected", type="negative")
         return None
@@ -23,15 +27,14 @@ def save_upload(e, path):
     filename = os.path.basename(e.file.name)
     save_path = os.path.join(path, filename)
 
-    # Check if _path exists and copy file from there
-    if hasattr(e.file, '_path') and e.file._path:
-        shutil.copy2(e.file._path, save_path)
-    else:
-        with open(save_path, "wb") as f:
-            f.write(e.file._data)
+    try:
+        size = await stream_upload(e.file, save_path)
+    except UploadError as error:
+        ui.notify(f"{filename}: {error}", type="negative")
+        logging.warning(f"Upload of {filename} rejected: {error}")
+        return None
 
-    file_size = format_size(os.path.getsize(save_path))
-    msg = f"File saved: {filename} ({file_size})"
+    msg = f"File saved: {filename} ({format_size(size)})"
     ui.notify(msg, type="positive")
     logging.info(msg)
     return save_path
@@ -77,47 +80,86 @@ def get_langs():
         return []
 
 
+def get_listing_version(dir):
+    """Change counter of an indexed directory (None when the directory is not indexed)"""
+    index = get_index(dir)
+    return index.version if index is not None else None
+
+
 def get_file_list(dir):
     """Return list of output files available for download"""
+    files, _ = get_file_page(dir)
+    return files
+
+
+def get_file_page(dir, offset=0, limit=None, sort_by="name", descending=False):
+    """
+    Return one sorted page of a directory listing and the total number of files.
+    Served from the directory's in-memory index when it has one.
+    """
+    index = get_index(dir)
+    if index is None:
+        index = DirectoryIndex(dir)
+        index.scan()
+
+    entries, total = index.page(offset=offset, limit=limit, sort_by=sort_by, descending=descending)
     files = [
         {
-            "name": f,
-            "size": format_size(os.path.getsize(os.path.join(dir, f))),
-            "download_url": f"/download/{f}"  # URL to secure download endpoint
+            "name": name,
+            "size": format_size(size),
+            "download_url": f"/download/{name}"  # URL to secure download endpoint
         }
-        for f in os.listdir(dir)
-        if os.path.isfile(os.path.join(dir, f))
+        for name, size, _ in entries
     ]
-    return files
+    return files, total
 
 
-def image_to_pdf(file_path: str):
+async def image_to_pdf(file_path: str):
     """Convert single image file to PDF in the same directory"""
 
     if not file_path.lower().endswith(Config.SUPPORTED_IMAGE_EXTENSIONS):
         return
 
-    pdf_name = os.path.splitext(os.path.basename(file_path))[0] + ".pdf"
-    pdf_path = os.path.join(os.path.dirname(file_path), pdf_name)
-
     try:
-        with open(pdf_path, "wb") as f:
-            # f.write(img2pdf.convert(file_path))  # type: ignore
-            f.write(img2pdf.convert(file_path, rotation=img2pdf.Rotation.ifvalid))  # type: ignore
-
-        os.remove(file_path)
-        logging.info(f"Converted and removed original: {file_path}")
-        ui.notify(f"Image converted: {pdf_name}", type="positive")
+        pdf_path = await cpu_executor.run(convert_image, file_path)
+        ui.notify(f"Image converted: {os.path.basename(pdf_path)}", type="positive")
 
     except Exception as e:
         logging.error(f"Failed to convert '{file_path}': {e}")
         ui.notify(f"Error converting {os.path.basename(file_path)}", type="negative")
 
 
+def convert_image(file_path: str) -> str:
+    """Replace an image file with a PDF of the same name and return the PDF path"""
+    pdf_name = os.path.splitext(os.path.basename(file_path))[0] + ".pdf"
+    pdf_path = os.path.join(os.path.dirname(file_path), pdf_name)
+
+    with convert_seconds.time(kind="image"), published(pdf_path) as tmp_path, open(tmp_path, "wb") as f:
+        # f.write(img2pdf.convert(file_path))  # type: ignore
+        f.write(img2pdf.convert(file_path, rotation=img2pdf.Rotation.ifvalid))  # type: ignore
+
+    os.remove(file_path)
+    logging.info(f"Converted and removed original: {file_path}")
+    return pdf_path
+
+
+def merge_pdfs(pdf_files: list, output_path: str):
+    """Merge PDF files in the given order into output_path"""
+    with merge_seconds.time():
+        merger = PdfMerger()
+        try:
+            for pdf in pdf_files:
+                merger.append(pdf)
+            with published(output_path) as tmp_path:
+                merger.write(tmp_path)
+        finally:
+            merger.close()
+
+
 def pdf_to_jpg(pdf_path, dpi=200, output_dir=Config.MERGE_DIR):
     """
     Converts a PDF file to JPG images.
-    Each page is saved as a separate JPG file.
+    Each page is saved as a separate JPG file, a few pages at a time.
 
     :param pdf_path: path to the PDF file
     :param dpi: resolution in DPI (default is 200)
@@ -126,22 +168,10 @@ def pdf_to_jpg(pdf_path, dpi=200, output_dir=Config.MERGE_DIR):
     if output_dir is None:
         output_dir = os.path.dirname(pdf_path)
 
-    # Extract the base filename without extension
-    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-
-    # Convert PDF pages to images
-    pages = convert_from_path(pdf_path, dpi=dpi)
-    num_pages = len(pages)
-
-    # Determine padding width for page numbers
-    padding_width = len(str(num_pages)) if num_pages > 1 else 0
-
-    for i, page in enumerate(pages, start=1):
-        # Format page number with appropriate padding
-        page_suffix = f"_{i:0{padding_width}d}" if num_pages > 1 else ""
-
-        output_file = os.path.join(output_dir, f"{base_name}{page_suffix}.jpg")
-        page.save(output_file, "JPEG")
+    num_pages = count_pages(pdf_path)
+    window = max(1, Config.convert_window_pages)
+    for first in range(1, num_pages + 1, window):
+        render_pages(pdf_path, first, min(first + window - 1, num_pages), num_pages, output_dir, dpi=dpi)
 
 
 def format_size(size_in_bytes: int) -> str:
@@ -154,8 +184,14 @@ def format_size(size_in_bytes: int) -> str:
         return f"{size_in_bytes / (1024 ** 2):.2f} MB"
 
 
-def clear_all_data():
+async def clear_all_data():
     """Clear all files from input and output directories"""
+    await io_executor.run(clear_dirs)
+    ui.notify("Cleared", type="positive")
+
+
+def clear_dirs():
+    """Delete all files from input and output directories"""
     dirs = [Config.INPUT_DIR, Config.OUTPUT_DIR, Config.MERGE_DIR, Config.CONVERT_DIR]
     for directory in dirs:
         for filename in os.listdir(directory):
@@ -170,29 +206,17 @@ def clear_all_data():
 
         logging.info(f"Directory {directory} has been cleared")
 
-    ui.notify("Cleared", type="positive")
-
 
 async def download_zip(dir):
-    """Create and download a ZIP archive with all files"""
-    # Check if output directory exists and contains files
-    if not os.path.exists(dir) or not any(Path(dir).iterdir()):
+    """Download a ZIP archive with all files, streamed by the /zip endpoint"""
+    # Check if the directory contains files
+    _, total = get_file_page(dir, limit=0)
+    if total == 0:
         ui.notify("No files to download", type="warning")
         return
 
-    # Create ZIP archive in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for file_path in Path(dir).iterdir():
-            if file_path.is_file():
-                zip_file.write(file_path, file_path.name)
-
-    # Generate timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
-
-    zip_buffer.seek(0)
     # Trigger download
-    ui.download(zip_buffer.getvalue(), f'ocr_machine_files_{timestamp}.zip', 'application/zip')
+    ui.download.from_url(f"/zip/{os.path.basename(os.path.normpath(dir))}")
     ui.notify("Downloading all files as ZIP archive", type="info")
 
 
@@ -0,0 +1,171 @@
+import time
+from collections import deque
+from enum import Enum
+
+from .functions import format_size
+
+
+class Status(Enum):
+    """Status values used during file processing"""
+    NEW = "New"
+    WAITING = "Waiting"
+    PROCESSING = "Processing"
+    DONE = "Done"
+    ERROR = "Error"
+    TIMEOUT = "Timeout"
+    CANCELLED = "Cancelled"
+
+
+FINISHED = (Status.DONE, Status.ERROR, Status.TIMEOUT, Status.CANCELLED)
+OCR_STAGES = ("OCR", "Image processing")  # ocrmypdf steps that advance page by page
+RATE_SAMPLE_SECONDS = 1.0  # shortest span of one pages-per-second figure
+FOLDER_OWNER = "folder"  # owner of files dropped into the input folder, for fair-share scheduling
+
+
+def format_eta(seconds) -> str:
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class PageRate:
+    """Moving average of the most recent pages-per-second figures"""
+
+    def __init__(self, samples: int = 8):
+        self._rates = deque(maxlen=samples)
+
+    def add(self, pages: float, seconds: float):
+        if pages > 0 and seconds > 0:
+            self._rates.append(pages / seconds)
+
+    def average(self):
+        return sum(self._rates) / len(self._rates) if self._rates else None
+
+
+class Job:
+    """One input file in the OCR workflow"""
+
+    __slots__ = (
+        "id", "name", "path", "status", "size", "pages", "settings", "owner", "output_path", "size_after", "finished_at",
+        "cache_key", "work_dir", "chunks", "chunks_left", "chunks_failed",
+        "queued_at", "started_at", "ocr_seconds", "cpu_seconds", "peak_rss_kb",
+        "stage", "pages_done", "progress_at", "sample_pages", "rate",
+    )
+
+    def __init__(self, name: str, path: str, size: int, pages: int = None, settings: dict = None, id: int = None,
+                 owner: str = FOLDER_OWNER):
+        self.id = id
+        self.name = name
+        self.path = path
+        self.status = Status.NEW
+        self.size = size  # bytes
+        self.pages = pages
+        self.settings = settings
+        self.owner = owner  # browser session or folder the file came from
+        self.output_path = None
+        self.size_after = None
+        self.finished_at = None  # time.time() when the job became DONE or ERROR
+        self.cache_key = None
+        # Split files only
+        self.work_dir = None
+        self.chunks = None
+        self.chunks_left = 0
+        self.chunks_failed = 0
+        # Timing record
+        self.queued_at = time.time()
+        self.started_at = None  # time.time() when a worker first took the job
+        self.ocr_seconds = 0.0  # wall time of its OCR runs
+        self.cpu_seconds = 0.0
+        self.peak_rss_kb = 0
+        # Progress while processing, from ocrmypdf's progress reports
+        self.stage = None  # current ocrmypdf step, e.g. "OCR"
+        self.pages_done = 0.0
+        self.progress_at = None  # time.monotonic() when the current page rate sample started
+        self.sample_pages = 0.0  # pages done since then
+        self.rate = None  # PageRate of this job, created with the first report
+
+    def set_status(self, status: Status):
+        self.status = status
+        self.finished_at = time.time() if status in FINISHED else None
+        if status == Status.PROCESSING and self.started_at is None:
+            self.started_at = time.time()
+
+    def advance(self, stage: str, pages: float):
+        """
+        Record a progress report: the job is in ocrmypdf step `stage` and `pages` more pages are done.
+        Returns (pages, seconds) when this completes a sample for the page rate, otherwise None.
+        """
+        now = time.monotonic()
+        if self.rate is None:
+            self.rate = PageRate()
+        if self.pages:
+            pages = min(pages, self.pages - self.pages_done)
+        self.pages_done += max(0.0, pages)
+        if stage != self.stage or self.progress_at is None:
+            # Time spent in other steps must not count as OCR time
+            self.stage = stage
+            self.progress_at, self.sample_pages = now, 0.0
+            return None
+        self.sample_pages += max(0.0, pages)
+        elapsed = now - self.progress_at
+        # Reports of chunks OCR'd in parallel arrive close together: only sample over a longer span
+        if self.sample_pages <= 0 or elapsed < RATE_SAMPLE_SECONDS:
+            return None
+        sample = (self.sample_pages, elapsed)
+        self.rate.add(*sample)
+        self.progress_at, self.sample_pages = now, 0.0
+        return sample
+
+    def eta(self, fallback_rate: float = None):
+        """Estimated seconds until all pages are OCR'd, from the recent page rate (or fallback_rate)"""
+        if not self.pages:
+            return None
+        rate = (self.rate and self.rate.average()) or fallback_rate
+        return max(0.0, self.pages - self.pages_done) / rate if rate else None
+
+    def add_usage(self, usage: dict, share: float = 1.0):
+        """Account (a share of) one OCR run, as filled in by Processor.run_ocr"""
+        self.ocr_seconds += usage.get("wall_s", 0.0) * share
+        self.cpu_seconds += usage.get("cpu_s", 0.0) * share
+        self.peak_rss_kb = max(self.peak_rss_kb, usage.get("peak_rss_kb", 0))
+
+    def timings(self) -> dict:
+        """Per-stage timing record of a finished job"""
+        started = self.started_at or self.queued_at
+        return {
+            "queue_wait_s": round(started - self.queued_at, 3),
+            "processing_s": round((self.finished_at or time.time()) - started, 3),
+            "ocr_s": round(self.ocr_seconds, 3),
+            "cpu_s": round(self.cpu_seconds, 3),
+            "peak_rss_kb": self.peak_rss_kb,
+            "pages_per_s": round(self.pages / self.ocr_seconds, 3) if self.pages and self.ocr_seconds else None,
+            "size_ratio": round(self.size_after / self.size, 3) if self.size_after and self.size else None,
+        }
+
+    def row(self, fallback_rate: float = None) -> dict:
+        """Display copy for the processing table"""
+        progress = eta = ""
+        if self.status == Status.PROCESSING and self.stage:
+            counting = self.stage in OCR_STAGES and self.pages
+            progress = f"{int(self.pages_done)}/{self.pages} pages" if counting else self.stage
+            eta = format_eta(self.eta(fallback_rate))
+        return {
+            "id": self.id, "name": self.name, "status": self.status.value, "size": format_size(self.size or 0),
+            "progress": progress, "eta": eta,
+        }
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name!r}, {self.status.name})"
+
+
+class Chunk:
+    """A page range of a split Job, OCR'd on its own"""
+
+    __slots__ = ("parent", "path", "output_path")
+
+    def __init__(self, parent: Job, path: str, output_path: str):
+        self.parent = parent
+        self.path = path
+        self.output_path = output_path
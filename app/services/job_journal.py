@@ -0,0 +1,128 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    size INTEGER,
+    pages INTEGER,
+    settings TEXT,
+    output_path TEXT,
+    timings TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE TABLE IF NOT EXISTS transitions (
+    job_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_job ON transitions(job_id);
+"""
+
+
+class JobJournal:
+    """
+    Durable SQLite record of jobs and their status transitions.
+    Writes are queued and committed in batches by a background thread, so callers never wait on disk.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "timings" not in columns:  # journal from an older version
+                db.execute("ALTER TABLE jobs ADD COLUMN timings TEXT")
+        threading.Thread(target=self._writer, daemon=True, name="JobJournal").start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(self, job):
+        """Queue the current state of a Job for writing; finished jobs also store their timing record"""
+        timings = json.dumps(job.timings()) if job.finished_at else None
+        self._queue.put((
+            job.id, job.name, job.path, job.status.name, job.size, job.pages,
+            json.dumps(job.settings), job.output_path, timings, time.time(),
+        ))
+
+    def forget(self, job_id: int):
+        """Queue the removal of a job, e.g. one that another node took over"""
+        self._queue.put(job_id)
+
+    def _writer(self):
+        db = self._connect()
+        while True:
+            items = [self._queue.get()]
+            time.sleep(self.flush_interval)  # let a batch accumulate
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if isinstance(item, tuple)]
+            forgotten = [(item,) for item in items if not isinstance(item, tuple)]
+            try:
+                with db:
+                    db.executemany(
+                        """INSERT INTO jobs (id, name, path, status, size, pages, settings, output_path, timings, created,
+                                             updated)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(id) DO UPDATE SET status = excluded.status, path = excluded.path,
+                           output_path = excluded.output_path, pages = excluded.pages, timings = excluded.timings,
+                           updated = excluded.updated""",
+                        [row + (row[-1],) for row in rows],  # created = updated on first insert
+                    )
+                    db.executemany(
+                        "INSERT INTO transitions (job_id, status, ts) VALUES (?, ?, ?)",
+                        [(row[0], row[3], row[9]) for row in rows],
+                    )
+                    # Forgotten jobs are not recorded again, so deleting after the batch's records is safe
+                    db.executemany("DELETE FROM jobs WHERE id = ?", forgotten)
+                    db.executemany("DELETE FROM transitions WHERE job_id = ?", forgotten)
+            except sqlite3.Error as e:
+                logging.error(f"Job journal write failed ({len(items)} records): {e}")
+
+    def flush(self, timeout: float = 5):
+        """Wait until queued records have been written (best effort)"""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(self.flush_interval)
+
+    def max_id(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+
+    def unfinished(self) -> list:
+        """Jobs that were queued or running when the app stopped"""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status NOT IN ('DONE', 'ERROR', 'TIMEOUT', 'CANCELLED') ORDER BY id"
+            ).fetchall()
+        return [dict(row, settings=json.loads(row["settings"] or "null")) for row in rows]
+
+    def history(self, limit: int = 100) -> list:
+        """Most recently finished jobs, newest first"""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status IN ('DONE', 'ERROR', 'TIMEOUT', 'CANCELLED') ORDER BY updated DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row, timings=json.loads(row["timings"] or "null")) for row in rows]
@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+
+from .scheduling import FifoPolicy
+
+
+class JobQueue:
+    """Thread-safe queue of jobs waiting for a free worker, handed out in the order of its scheduling policy"""
+
+    def __init__(self, policy=None):
+        self._pending = policy if policy is not None else FifoPolicy()
+        self._stops = 0  # pending stop requests for consumers
+        self._cond = threading.Condition()
+
+    def put(self, job):
+        """Enqueue a job and wake up the waiting consumers"""
+        with self._cond:
+            self._pending.push(job)
+            # A batch collector waiting in take() may not want the job, so a single wakeup could miss the worker
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Block until a job is available and return it (None on timeout or stop request)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._stops or self._pending, timeout=timeout):
+                return None
+            if self._stops:
+                self._stops -= 1
+                return None
+            return self._pending.pop()
+
+    def set_policy(self, policy):
+        """Switch to another scheduling policy, keeping the pending jobs"""
+        with self._cond:
+            old = self._pending
+            while old:
+                policy.push(old.pop())
+            self._pending = policy
+
+    @property
+    def policy(self) -> str:
+        with self._cond:
+            return self._pending.name
+
+    def request_stop(self, count=1):
+        """Make the next `count` calls to get() return None so idle consumers can exit"""
+        with self._cond:
+            self._stops += count
+            self._cond.notify(count)
+
+    def cancel_stop(self, count):
+        """Withdraw up to `count` stop requests not yet consumed, return how many were withdrawn"""
+        with self._cond:
+            withdrawn = min(count, self._stops)
+            self._stops -= withdrawn
+            return withdrawn
+
+    def take(self, predicate, limit: int, timeout: float = 0, lookahead: int = 256) -> list:
+        """
+        Remove and return up to `limit` pending jobs matching `predicate`.
+        Waits up to `timeout` seconds for more matches to arrive; only the first
+        `lookahead` pending jobs are inspected so the cost stays bounded on a long backlog.
+        """
+        taken = []
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                matches = [job for job in itertools.islice(self._pending, lookahead) if predicate(job)]
+                if matches and len(taken) < limit:
+                    chosen = {id(job) for job in matches[:limit - len(taken)]}
+                    taken += self._pending.remove(lambda job: id(job) in chosen)
+                remaining = deadline - time.monotonic()
+                if len(taken) >= limit or remaining <= 0:
+                    return taken
+                self._cond.wait(remaining)
+
+    def remove(self, predicate) -> list:
+        """Remove and return all pending jobs matching `predicate`"""
+        with self._cond:
+            return self._pending.remove(predicate)
+
+    def clear(self):
+        """Drop all pending jobs"""
+        with self._cond:
+            self._pending.remove(lambda job: True)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
@@ -0,0 +1,229 @@
+import bisect
+import math
+import threading
+import time
+from collections import deque
+
+# Upper bounds (le) of histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** power * 1024 ** 2 for power in range(0, 14))  # 1 MB .. 8 GB
+RATIO_BUCKETS = (0.25, 0.5, 0.75, 1, 1.25, 1.5, 2, 3, 5, 10)
+RATE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base of the metric types: a name, help text and optional label names"""
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> list:
+        """(suffix, label string, value) lines of the exposition"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+
+class Gauge(Metric):
+    """Current value, read from a callback when the metrics are collected"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, callback, labelnames: tuple = ()):
+        """
+        :param callback: function() returning the value, or {label values tuple: value} when labelnames are given
+        """
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def samples(self) -> list:
+        values = self.callback()
+        if not self.labelnames:
+            return [("", "", values)]
+        return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DURATION_BUCKETS, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def stats(self, **labels) -> dict:
+        """{"count", "sum", "avg"} of one series"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            total, count = (series[-2], series[-1]) if series else (0.0, 0)
+        return {"count": count, "sum": total, "avg": total / count if count else 0.0}
+
+    def samples(self) -> list:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                samples.append(("_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, values[-2]))
+            samples.append(("_count", labels, values[-1]))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class RateWindow:
+    """Sum of recent events over a sliding time window, for current throughput"""
+
+    def __init__(self, seconds: float = 300):
+        self.seconds = seconds
+        self._lock = threading.Lock()
+        self._events = deque()  # (time, amount)
+
+    def add(self, amount: float = 1):
+        with self._lock:
+            self._events.append((time.monotonic(), amount))
+            self._expire()
+
+    def _expire(self):
+        limit = time.monotonic() - self.seconds
+        while self._events and self._events[0][0] < limit:
+            self._events.popleft()
+
+    def per_minute(self) -> float:
+        """Average rate over the window in events per minute"""
+        with self._lock:
+            self._expire()
+            total = sum(amount for _, amount in self._events)
+        return total * 60 / self.seconds
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+# OCR pipeline, per stage
+input_settle_seconds = registry.register(Histogram(
+    "ocr_machine_input_settle_seconds", "Time from the first event of an input file until it was fully written"))
+add_file_seconds = registry.register(Histogram(
+    "ocr_machine_add_file_seconds", "Time to inspect and queue an input file"))
+queue_wait_seconds = registry.register(Histogram(
+    "ocr_machine_queue_wait_seconds", "Time a job waited in the queue before a worker started it"))
+ocr_run_seconds = registry.register(Histogram(
+    "ocr_machine_ocr_run_seconds", "Wall time of one ocrmypdf run (file, chunk or batch)", labelnames=("result",)))
+ocr_cpu_seconds = registry.register(Histogram(
+    "ocr_machine_ocr_cpu_seconds", "CPU time of one ocrmypdf run, including its subprocesses"))
+ocr_peak_rss_bytes = registry.register(Histogram(
+    "ocr_machine_ocr_peak_rss_bytes", "Peak resident memory of the OCR worker process during a run", BYTES_BUCKETS))
+job_seconds = registry.register(Histogram(
+    "ocr_machine_job_seconds", "Time from the start of processing until a job finished", labelnames=("status",)))
+job_pages_per_second = registry.register(Histogram(
+    "ocr_machine_job_pages_per_second", "Pages per second of OCR wall time for finished jobs", RATE_BUCKETS))
+job_size_ratio = registry.register(Histogram(
+    "ocr_machine_job_size_ratio", "Output size divided by input size of finished jobs", RATIO_BUCKETS))
+jobs_total = registry.register(Counter(
+    "ocr_machine_jobs_total", "Finished jobs", labelnames=("status",)))
+pages_total = registry.register(Counter(
+    "ocr_machine_pages_total", "Pages of successfully processed jobs"))
+
+# Other operations
+upload_seconds = registry.register(Histogram(
+    "ocr_machine_upload_seconds", "Duration of uploads (form: whole file, chunk: one resumable upload request)",
+    labelnames=("method",)))
+merge_seconds = registry.register(Histogram(
+    "ocr_machine_merge_seconds", "Duration of merging PDFs"))
+convert_seconds = registry.register(Histogram(
+    "ocr_machine_convert_seconds", "Duration of conversions (image: image to PDF, pages: one PDF-to-image window)",
+    labelnames=("kind",)))
+download_seconds = registry.register(Histogram(
+    "ocr_machine_download_seconds", "Duration of downloads until the last byte was sent", labelnames=("kind",)))
+
+# Current throughput, for the stats page
+pages_done = RateWindow()
+files_done = RateWindow()
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from .metrics import Gauge, registry
+
+HEARTBEAT_FILE = "heartbeat.json"
+
+
+def node_name() -> str:
+    """Name of this instance: $OCR_NODE_NAME, else the host name (the container id under Docker)"""
+    return os.environ.get("OCR_NODE_NAME") or socket.gethostname()
+
+
+class NodeCoordinator:
+    """
+    Lets several instances (nodes) consume one input folder on a shared volume.
+
+    A node claims an input file right before OCR by renaming it into its own claimed/ directory;
+    the rename is atomic, so exactly one node gets the file. Every node writes a heartbeat file with a
+    counter and its throughput. A node whose counter did not change for the lease time is considered
+    dead, and the others move the files it had claimed back into the input folder. Liveness is judged by
+    each node's own clock, so the nodes' clocks need not agree.
+
+    Layout under nodes_dir/<name>/: heartbeat.json, claimed/ (inputs being processed), work/ and jobs.db.
+    """
+
+    def __init__(self, nodes_dir: str, input_dir: str, name: str = None, heartbeat_seconds: float = 10.0,
+                 lease_seconds: float = 60.0, status=None):
+        """
+        :param status: optional callback function() -> dict of figures published in the heartbeat
+        """
+        self.name = name or node_name()
+        self.nodes_dir = nodes_dir
+        self.input_dir = input_dir
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease_seconds = lease_seconds
+        self.status = status or (lambda: {})
+        self.node_dir = os.path.join(nodes_dir, self.name)
+        self.claimed_dir = os.path.join(self.node_dir, "claimed")
+        self.work_dir = os.path.join(self.node_dir, "work")
+        self.journal_file = os.path.join(self.node_dir, "jobs.db")
+        os.makedirs(self.claimed_dir, exist_ok=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.started = time.time()
+        self._beat = 0
+        self._beat_ok = time.monotonic()  # last successful heartbeat write
+        self._seen = {}  # node name -> (heartbeat counter, time.monotonic() when it last changed)
+        self._nodes = []  # heartbeats of all nodes as of the last check
+
+    def claim(self, path: str, prefix: str) -> str:
+        """
+        Take an input file for this node: returns its path in claimed/ (named `prefix`-<name>, so equal names
+        do not clash), or None when another node was faster or this node's own lease may have run out.
+        """
+        if time.monotonic() - self._beat_ok > self.lease_seconds / 2:
+            logging.warning(f"Heartbeat of node {self.name} is overdue, not claiming {path}")
+            return None
+        claimed_path = os.path.join(self.claimed_dir, f"{prefix}-{os.path.basename(path)}")
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            return None
+        return claimed_path
+
+    def heartbeat(self):
+        """Publish this node's heartbeat (written to a temporary file, then renamed into place)"""
+        self._beat += 1
+        info = {
+            "node": self.name,
+            "beat": self._beat,
+            "pid": os.getpid(),
+            "started": self.started,
+            "time": time.time(),
+            **self.status(),
+        }
+        path = os.path.join(self.node_dir, HEARTBEAT_FILE)
+        tmp_path = os.path.join(self.node_dir, f".{HEARTBEAT_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, path)
+        self._beat_ok = time.monotonic()
+
+    def _read_heartbeats(self) -> list:
+        """Heartbeats of all nodes with "alive" and "age" (seconds since the counter last changed) added"""
+        now = time.monotonic()
+        nodes = []
+        with os.scandir(self.nodes_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                try:
+                    with open(os.path.join(entry.path, HEARTBEAT_FILE), encoding="utf-8") as f:
+                        info = json.load(f)
+                except (OSError, ValueError):
+                    info = {}  # never started or caught mid-write: judged by the counter alone
+                info["node"] = entry.name
+                beat = info.get("beat")
+                seen = self._seen.get(entry.name)
+                if seen is None or seen[0] != beat:
+                    seen = self._seen[entry.name] = (beat, now)
+                info["age"] = now - seen[1]
+                info["alive"] = entry.name == self.name or info["age"] <= self.lease_seconds
+                nodes.append(info)
+        return nodes
+
+    def reclaim(self, node: str) -> int:
+        """Move the files claimed by a dead node back into the input folder, return how many were moved"""
+        claimed_dir = os.path.join(self.nodes_dir, node, "claimed")
+        moved = 0
+        try:
+            entries = list(os.scandir(claimed_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            name = entry.name.split("-", 1)[-1]
+            target = os.path.join(self.input_dir, name)
+            if os.path.exists(target):
+                continue  # a new file of the same name is waiting, retried on the next check
+            try:
+                os.rename(entry.path, target)
+                moved += 1
+            except FileNotFoundError:
+                pass  # another node was faster
+        if moved:
+            logging.warning(f"Node {node} is gone, moved {moved} of its files back to {self.input_dir}")
+        return moved
+
+    def check(self):
+        """Send the heartbeat, refresh the view of the other nodes and reclaim the work of dead ones"""
+        try:
+            self.heartbeat()
+        except OSError as e:
+            logging.error(f"Heartbeat of node {self.name} failed: {e}")
+        nodes = self._read_heartbeats()
+        self._nodes = nodes
+        for info in nodes:
+            if not info["alive"]:
+                self.reclaim(info["node"])
+
+    def nodes(self) -> list:
+        """Heartbeats of all nodes as of the last check, live nodes first"""
+        return sorted(self._nodes, key=lambda info: (not info["alive"], info["node"]))
+
+    def _run(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Node check failed: {e}")
+
+    def start(self):
+        """Announce this node and keep its heartbeat going"""
+        self.check()
+        threading.Thread(target=self._run, daemon=True, name="NodeHeartbeat").start()
+        logging.info(f"Node {self.name} started, sharing {self.input_dir}")
+
+        def by_node(field: str):
+            return lambda: {(info["node"],): info.get(field) or 0 for info in self.nodes()}
+
+        registry.register(Gauge("ocr_machine_node_up", "Whether a node sharing the input folder is alive",
+                                lambda: {(info["node"],): int(info["alive"]) for info in self.nodes()},
+                                labelnames=("node",)))
+        registry.register(Gauge("ocr_machine_node_pages_per_minute", "Pages OCR'd per minute by each node (last 5 min)",
+                                by_node("pages_per_minute"), labelnames=("node",)))
+        registry.register(Gauge("ocr_machine_node_files_per_minute", "Files OCR'd per minute by each node (last 5 min)",
+                                by_node("files_per_minute"), labelnames=("node",)))
+        registry.register(Gauge("ocr_machine_node_pages", "Pages OCR'd by each node since it started",
+                                by_node("pages_total"), labelnames=("node",)))
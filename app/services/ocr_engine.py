@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .publish import scratch_dir
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_worker.py")
+WATCHDOG_INTERVAL = 1.0  # seconds between timeout checks of running workers
+
+
+class OcrWorkerError(Exception):
+    """Raised when a worker process dies or breaks the protocol"""
+
+
+class OcrTimeout(OcrWorkerError):
+    """Raised when a run was killed for exceeding a timeout"""
+
+
+class OcrCancelled(OcrWorkerError):
+    """Raised when a run was killed on request"""
+
+
+class OcrWorkerProcess:
+    """Handle to one warm ocr_worker.py process"""
+
+    def __init__(self):
+        self.jobs_done = 0
+        self.rss_kb = 0
+        self.started_at = None  # monotonic start of the current run, None while idle
+        self.progress_at = None  # monotonic time of its last progress event
+        self.killed = None  # error the current run fails with after kill()
+        self.proc = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            start_new_session=True,  # own process group, so the whole tree can be signalled
+            env={**os.environ, "TMPDIR": scratch_dir()},  # ocrmypdf's intermediate files stay in the scratch area
+        )
+        ready = self._read_event()
+        if ready.get("event") != "ready":
+            self.close()
+            raise OcrWorkerError(f"Unexpected worker greeting: {ready}")
+        self.version = ready.get("version", "")
+        logging.info(f"OCR worker started (pid {self.proc.pid}, ocrmypdf {self.version})")
+
+    def _read_event(self) -> dict:
+        line = self.proc.stdout.readline()
+        if not line and self.killed:
+            raise self.killed
+        if not line:
+            raise OcrWorkerError(f"OCR worker {self.proc.pid} exited ({self.proc.poll()})")
+        return json.loads(line)
+
+    def run(self, input_path: str, output_path: str, options: dict, on_progress=None) -> dict:
+        """Send one job to the worker and wait for its result event, passing progress events to on_progress"""
+        request = {"input": input_path, "output": output_path, "options": options}
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise OcrWorkerError(f"OCR worker {self.proc.pid} is gone: {e}")
+
+        self.started_at = self.progress_at = time.monotonic()
+        try:
+            while True:
+                event = self._read_event()
+                if event.get("event") == "result":
+                    self.jobs_done += 1
+                    self.rss_kb = event.get("rss_kb", 0)
+                    return event
+                if event.get("event") == "progress":
+                    self.progress_at = time.monotonic()
+                    self._progress(event, on_progress)
+        finally:
+            self.started_at = self.progress_at = None
+
+    @staticmethod
+    def _progress(event: dict, on_progress):
+        if on_progress:
+            try:
+                on_progress(event)
+            except Exception as e:
+                logging.warning(f"Progress handler failed: {e}")
+
+    def kill(self, error: OcrWorkerError):
+        """Kill the worker with its whole process group (ocrmypdf, tesseract, gs); the running job fails with `error`"""
+        self.killed = error
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        """Stop the worker: EOF on stdin ends its loop, kill it if it does not exit"""
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+
+
+class OcrEngine:
+    """Pool of warm OCR worker processes, recycled after a number of jobs or above a memory limit"""
+
+    def __init__(self, max_jobs_per_worker: int = 50, max_memory_mb: int = 1024, page_timeout: float = 0,
+                 job_timeout: float = 0):
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_mb = max_memory_mb
+        self.page_timeout = page_timeout
+        self.job_timeout = job_timeout
+        self._idle = []
+        self._running = {}  # worker -> ids of the jobs its run works for
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    def configure(self, max_jobs_per_worker: int, max_memory_mb: int, page_timeout: float = 0, job_timeout: float = 0):
+        """Update recycling limits (applied when a worker is returned to the pool) and timeouts (0 = none)"""
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_memory_mb = max_memory_mb
+        self.page_timeout = page_timeout
+        self.job_timeout = job_timeout
+
+    def run(self, input_path: str, output_path: str, options: dict, on_progress=None, owners: tuple = ()) -> dict:
+        """
+        Run ocrmypdf on one file in a warm worker.
+        The worker is killed with OcrTimeout once the run exceeds job_timeout seconds or reports no progress
+        for page_timeout seconds, and with OcrCancelled by cancel() of one of its owners.
+
+        :param options: keyword arguments for ocrmypdf.ocr()
+        :param on_progress: optional callback function(event) for {"desc", "unit", "done", "total"} progress events
+        :param owners: ids of the jobs the run works for
+        :return: result event {"ok": bool, "error": str, "rss_kb": int, "peak_rss_kb": int, "cpu_s": float}
+        """
+        worker = self._checkout()
+        self._start_watchdog()
+        with self._lock:
+            self._running[worker] = tuple(owners)
+        try:
+            result = worker.run(input_path, output_path, options, on_progress)
+        except Exception:
+            worker.close()
+            raise
+        finally:
+            with self._lock:
+                self._running.pop(worker, None)
+        if worker.killed:  # the result arrived just before the kill
+            worker.close()
+        else:
+            self._checkin(worker)
+        return result
+
+    def cancel(self, *owners) -> int:
+        """Kill the runs working for any of the given job ids, return how many were killed"""
+        return self._cancel(lambda ids: not set(ids).isdisjoint(owners))
+
+    def cancel_all(self) -> int:
+        """Kill all running workers"""
+        return self._cancel(lambda ids: True)
+
+    def _cancel(self, predicate) -> int:
+        with self._lock:
+            workers = [worker for worker, ids in self._running.items() if predicate(ids)]
+        for worker in workers:
+            logging.info(f"Cancelling OCR worker {worker.proc.pid}")
+            worker.kill(OcrCancelled(f"OCR worker {worker.proc.pid} was cancelled"))
+        return len(workers)
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, daemon=True, name="OcrWatchdog")
+                self._watchdog.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            try:
+                self._check_timeouts()
+            except Exception as e:
+                logging.error(f"OCR watchdog failed: {e}")
+
+    def _check_timeouts(self):
+        """Kill workers whose run exceeds the job timeout or is stuck on a page"""
+        now = time.monotonic()
+        with self._lock:
+            running = list(self._running)
+        for worker in running:
+            started_at, progress_at = worker.started_at, worker.progress_at
+            if started_at is None or worker.killed:
+                continue
+            if self.job_timeout and now - started_at > self.job_timeout:
+                reason = f"run exceeded the job timeout of {self.job_timeout:g} s"
+            elif self.page_timeout and now - progress_at > self.page_timeout:
+                reason = f"no progress for {self.page_timeout:g} s"
+            else:
+                continue
+            logging.warning(f"Killing OCR worker {worker.proc.pid}: {reason}")
+            worker.kill(OcrTimeout(f"OCR timed out: {reason}"))
+
+    def trim(self, keep: int):
+        """Close idle workers beyond `keep`"""
+        with self._lock:
+            surplus = self._idle[keep:]
+            del self._idle[keep:]
+        for worker in surplus:
+            worker.close()
+
+    def _checkout(self) -> OcrWorkerProcess:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+        return OcrWorkerProcess()
+
+    def _checkin(self, worker: OcrWorkerProcess):
+        if worker.jobs_done >= self.max_jobs_per_worker or worker.rss_kb > self.max_memory_mb * 1024:
+            logging.info(f"Recycling OCR worker {worker.proc.pid} after {worker.jobs_done} jobs ({worker.rss_kb // 1024} MB)")
+            worker.close()
+            return
+        with self._lock:
+            self._idle.append(worker)
@@ -0,0 +1,54 @@
+"""
+ocrmypdf plugin that reports progress to the OCR worker.
+
+Loaded by ocr_worker.py (plugins=["ocr_progress"]), standalone like the worker itself.
+ocrmypdf drives one progress bar per pipeline step ("Scanning contents", "OCR",
+"PDF/A conversion", ...); each update is passed to `reporter`, throttled so a fast
+step does not flood the pipe to the parent.
+"""
+import time
+
+from ocrmypdf import hookimpl
+
+MIN_INTERVAL = 0.25  # seconds between reports of the same step
+
+# function(desc: str, unit: str, done: float, total: float | None), set by the worker
+reporter = None
+
+
+class WorkerProgressBar:
+    """ProgressBar protocol implementation forwarding to `reporter` instead of drawing"""
+
+    def __init__(self, *, total=None, desc=None, unit=None, disable=False, **kwargs):
+        # `disable` only means that no console output is wanted, progress is reported anyway
+        self.total = total
+        self.desc = desc or ""
+        self.unit = unit or ""
+        self.done = 0
+        self._reported = 0.0
+
+    def __enter__(self):
+        self._report(force=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.total and self.done < self.total:
+            self.done = self.total
+            self._report(force=True)
+        return False
+
+    def update(self, n=1, *, completed=None):
+        self.done = completed if completed is not None else self.done + n
+        self._report(force=self.total is not None and self.done >= self.total)
+
+    def _report(self, force: bool = False):
+        now = time.monotonic()
+        if reporter is None or (not force and now - self._reported < MIN_INTERVAL):
+            return
+        self._reported = now
+        reporter(self.desc, self.unit, self.done, self.total)
+
+
+@hookimpl(tryfirst=True)
+def get_progressbar_class():
+    return WorkerProgressBar
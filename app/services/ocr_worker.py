@@ -0,0 +1,96 @@
+"""
+Long-lived OCR worker process.
+
+Started by OcrEngine as a standalone script (no imports from the app), it loads
+ocrmypdf once and then serves jobs read as JSON lines from stdin, writing JSON
+events back to the parent, one per line: "progress" events while a job runs
+(from the ocr_progress plugin next to this script), then its "result".
+"""
+import json
+import os
+import resource
+import sys
+
+
+def current_rss_kb() -> int:
+    """Return resident memory of this process in KB"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reset_peak_rss():
+    """Restart peak memory accounting (VmHWM) for the next job; Linux only"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_kb() -> int:
+    """Return peak resident memory of this process in KB since the last reset"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cpu_seconds() -> float:
+    """User and system CPU time of this process and its finished subprocesses (tesseract, ghostscript)"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def main():
+    # Keep a private copy of stdout for the protocol; anything else printing to fd 1
+    # (ocrmypdf, tesseract, ghostscript) ends up on stderr instead
+    channel = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def send(event: dict):
+        channel.write(json.dumps(event) + "\n")
+
+    # ocrmypdf parallelises per page with `jobs`, so tesseract itself runs single-threaded
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+    import ocrmypdf
+    import ocr_progress
+
+    def report_progress(desc: str, unit: str, done: float, total):
+        send({"event": "progress", "desc": desc, "unit": unit, "done": done, "total": total})
+
+    ocr_progress.reporter = report_progress
+    send({"event": "ready", "version": ocrmypdf.__version__})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        reset_peak_rss()
+        cpu_start = cpu_seconds()
+        try:
+            exit_code = ocrmypdf.ocr(request["input"], request["output"], plugins=["ocr_progress"], **request["options"])
+            ok = int(exit_code) == 0
+            error = "" if ok else f"ocrmypdf exit code {int(exit_code)}"
+        except Exception as e:
+            ok = False
+            error = f"{type(e).__name__}: {e}"
+        send({
+            "event": "result", "ok": ok, "error": error, "rss_kb": current_rss_kb(),
+            "peak_rss_kb": peak_rss_kb(), "cpu_s": round(cpu_seconds() - cpu_start, 3),
+        })
+
+
+if __name__ == "__main__":
+    main()
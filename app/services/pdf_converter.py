@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+from .core_budget import available_cores
+from .job import Status
+from .pdf_render import render_pages
+from .pdf_shards import count_pages
+from .update_bus import UpdateBus
+
+
+class PdfConverter:
+    """
+    Converts PDFs to JPG pages in the background.
+    Each document is split into windows of pages; windows of all documents are rendered in parallel
+    by a thread pool, each by its own pdftoppm process, and pages land on disk as soon as they are rendered.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = {}  # source path -> document
+        self.bus = UpdateBus()
+        self._executor = None
+        self._workers = 0
+
+    def resize(self, workers: int):
+        """Set the number of parallel renderers (0 = one per available core); running windows finish first"""
+        workers = workers if workers > 0 else available_cores()
+        with self.lock:
+            if workers == self._workers:
+                return
+            old, self._executor, self._workers = self._executor, ThreadPoolExecutor(workers, "PdfConvert"), workers
+        if old is not None:
+            old.shutdown(wait=False)  # already queued windows still run
+        logging.info(f"PDF conversion workers: {workers}")
+
+    def add_file(self, path: str):
+        """Queue a PDF for conversion into images next to it"""
+        if not path.lower().endswith(".pdf"):
+            return
+        with self.lock:
+            current = self.documents.get(path)
+            if current and current["status"] in (Status.WAITING, Status.PROCESSING):
+                return
+        try:
+            pages = count_pages(path)
+        except Exception as e:
+            logging.error(f"Cannot read {path}: {e}")
+            self._set_document(path, {"name": os.path.basename(path), "pages": 0, "done": 0, "status": Status.ERROR})
+            return
+
+        window = max(1, Config.convert_window_pages)
+        starts = range(1, pages + 1, window)
+        document = {
+            "name": os.path.basename(path),
+            "pages": pages,
+            "done": 0,
+            "status": Status.WAITING,
+            "remaining": len(starts),  # windows not finished yet
+            "failed": False,
+        }
+        self._set_document(path, document)
+        logging.info(f"Converting {path}: {pages} pages in {len(starts)} windows")
+
+        if self._executor is None:
+            self.resize(Config.convert_workers)
+        for first in starts:
+            self._executor.submit(self._render_window, path, document, first, min(first + window - 1, pages))
+
+    def add_files(self, paths: list):
+        for path in paths:
+            self.add_file(path)
+
+    def _set_document(self, path: str, document: dict):
+        with self.lock:
+            self.documents[path] = document
+        self.bus.publish("documents", path)
+
+    def _render_window(self, path: str, document: dict, first: int, last: int):
+        with self.lock:
+            if self.documents.get(path) is not document:
+                return  # replaced by a newer upload
+            document["status"] = Status.PROCESSING
+        self.bus.publish("documents", path)
+
+        try:
+            written = render_pages(path, first, last, document["pages"], os.path.dirname(path))
+        except Exception as e:
+            logging.warning(f"Error converting pages {first}-{last} of {path}: {e}")
+            written, failed = [], True
+        else:
+            failed = False
+
+        with self.lock:
+            document["done"] += len(written)
+            document["failed"] |= failed
+            document["remaining"] -= 1
+            finished = document["remaining"] == 0
+            if finished:
+                document["status"] = Status.ERROR if document["failed"] else Status.DONE
+        if finished:
+            self._finish(path, document)
+        self.bus.publish("documents", path)
+
+    def _finish(self, path: str, document: dict):
+        if document["status"] != Status.DONE:
+            logging.error(f"Conversion of {path} failed, {document['done']}/{document['pages']} pages written")
+            return
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"Failed to delete {path}: {e}")
+        with self.lock:
+            if self.documents.get(path) is document:
+                del self.documents[path]
+        logging.info(f"Converted {path}: {document['pages']} pages")
+
+    @staticmethod
+    def _row(path: str, document: dict) -> dict:
+        """Display copy of a document for the conversion table"""
+        return {
+            "path": path,
+            "name": document["name"],
+            "status": document["status"].value,
+            "progress": f"{document['done']}/{document['pages']}",
+        }
+
+    def get_rows(self) -> list:
+        """Documents being converted or failed, in name order"""
+        with self.lock:
+            rows = [self._row(path, document) for path, document in self.documents.items()]
+        return sorted(rows, key=lambda row: row["name"].lower())
+
+
+converter = PdfConverter()
@@ -0,0 +1,41 @@
+import os
+import shutil
+
+from pdf2image import convert_from_path
+
+from .metrics import convert_seconds
+from .publish import publish_file, scratch_subdir
+
+
+def page_image_name(base_name: str, page: int, num_pages: int) -> str:
+    """File name of one rendered page: <base>_<page>.jpg, zero-padded; no suffix for single-page documents"""
+    if num_pages == 1:
+        return f"{base_name}.jpg"
+    return f"{base_name}_{page:0{len(str(num_pages))}d}.jpg"
+
+
+def render_pages(pdf_path: str, first_page: int, last_page: int, num_pages: int, output_dir: str,
+                 dpi: int = 200) -> list:
+    """
+    Render pages first_page..last_page of a PDF to JPG files in output_dir.
+    pdftoppm writes the images straight to the scratch area (no page is held in memory); each
+    finished image is published to output_dir, so only complete files ever appear there.
+
+    :return: list of written image paths, in page order
+    """
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    scratch = scratch_subdir()
+    try:
+        with convert_seconds.time(kind="pages"):
+            rendered = convert_from_path(
+                pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                output_folder=scratch, fmt="jpeg", paths_only=True,
+            )
+            written = []
+            for page, path in enumerate(sorted(rendered), start=first_page):
+                output_file = os.path.join(output_dir, page_image_name(base_name, page, num_pages))
+                publish_file(path, output_file)
+                written.append(output_file)
+        return written
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,134 @@
+import contextlib
+import os
+
+import pikepdf
+
+# Document info entries describing the document itself; Producer and ModDate are written by OCRmyPDF
+DOCINFO_KEYS = ("/Title", "/Author", "/Subject", "/Keywords", "/Creator", "/CreationDate")
+
+
+def count_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF file"""
+    with pikepdf.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def split_pdf(pdf_path: str, chunk_pages: int, output_dir: str) -> list:
+    """
+    Split a PDF into files of at most `chunk_pages` pages.
+
+    :return: list of chunk paths, in page order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    chunks = []
+    with pikepdf.open(pdf_path) as src:
+        total = len(src.pages)
+        for start in range(0, total, chunk_pages):
+            chunk_path = os.path.join(output_dir, f"chunk_{start // chunk_pages + 1:05d}.pdf")
+            with pikepdf.new() as dst:
+                dst.pages.extend(src.pages[start:start + chunk_pages])
+                dst.save(chunk_path)
+            chunks.append(chunk_path)
+    return chunks
+
+
+def copy_metadata(src: pikepdf.Pdf, dst: pikepdf.Pdf):
+    """
+    Give `dst` the title, author etc. of `src`, both in the document info and in the XMP metadata.
+    The rest of the XMP metadata of `dst` (PDF/A identification) is kept.
+    """
+    for key in DOCINFO_KEYS:
+        if key in src.docinfo:
+            dst.docinfo[key] = src.docinfo[key]
+        elif key in dst.docinfo:
+            del dst.docinfo[key]
+    with dst.open_metadata(set_pikepdf_as_editor=False, update_docinfo=False) as meta:
+        meta.load_from_docinfo(dst.docinfo, delete_missing=True)
+
+
+def _copy_remapped(obj, dst: pikepdf.Pdf, pages: dict, copied: dict):
+    """
+    Copy an object of another PDF into `dst`, pointing references to its pages at the pages of `dst`
+    (copy_foreign would copy the referenced pages, and with them the whole page tree, too).
+    """
+    if isinstance(obj, pikepdf.Stream):
+        return dst.copy_foreign(obj)
+    if not isinstance(obj, (pikepdf.Dictionary, pikepdf.Array)):
+        return obj
+    if obj.is_indirect:
+        if obj.objgen in pages:
+            return pages[obj.objgen]
+        if obj.objgen in copied:
+            return copied[obj.objgen]
+    if isinstance(obj, pikepdf.Dictionary):
+        if obj.get("/Type") == "/Pages":
+            return dst.Root.Pages
+        new = pikepdf.Dictionary()
+    else:
+        new = pikepdf.Array()
+    if obj.is_indirect:
+        # Registered before its children are copied: outline items refer to each other in cycles
+        new = copied[obj.objgen] = dst.make_indirect(new)
+    if isinstance(obj, pikepdf.Dictionary):
+        for key, value in obj.items():
+            new[key] = _copy_remapped(value, dst, pages, copied)
+    else:
+        for value in obj:
+            new.append(_copy_remapped(value, dst, pages, copied))
+    return new
+
+
+def copy_document(src: pikepdf.Pdf, dst: pikepdf.Pdf):
+    """
+    Give `dst`, which holds the same pages as `src` in the same order (e.g. OCR'd), the metadata,
+    outline, page labels and named destinations of `src`.
+    """
+    copy_metadata(src, dst)
+    if len(src.pages) != len(dst.pages):
+        return
+    pages = {src_page.obj.objgen: dst_page.obj for src_page, dst_page in zip(src.pages, dst.pages)}
+    copied = {}
+    for key in ("/Outlines", "/PageLabels", "/Dests", "/PageMode"):
+        if key in dst.Root:
+            del dst.Root[key]
+        if key in src.Root:
+            dst.Root[key] = _copy_remapped(src.Root[key], dst, pages, copied)
+    if "/Names" in dst.Root and "/Dests" in dst.Root.Names:
+        del dst.Root.Names["/Dests"]
+    if "/Names" in src.Root and "/Dests" in src.Root.Names:
+        if "/Names" not in dst.Root:
+            dst.Root.Names = pikepdf.Dictionary()
+        dst.Root.Names.Dests = _copy_remapped(src.Root.Names.Dests, dst, pages, copied)
+
+
+def extract_pages(pdf_path: str, start: int, stop: int, output_path: str, original: str = None):
+    """
+    Write pages [start, stop) of a PDF to a new file.
+    Other pages are deleted from a copy so document-level data (PDF/A metadata) is kept;
+    the title, author, outline etc. are taken from the `original` file of these pages when given.
+    """
+    with pikepdf.open(pdf_path) as pdf:
+        del pdf.pages[stop:]
+        del pdf.pages[:start]
+        if original:
+            with pikepdf.open(original) as src:
+                copy_document(src, pdf)
+        pdf.save(output_path)
+
+
+def join_pdfs(pdf_paths: list, output_path: str, original: str = None):
+    """
+    Concatenate PDFs into one file.
+    Document-level data (PDF/A metadata, output intents) is taken from the first file;
+    the title, author, outline etc. from the `original` file that was split into these parts when given.
+    """
+    with contextlib.ExitStack() as stack:
+        pdf = stack.enter_context(pikepdf.open(pdf_paths[0]))
+        for path in pdf_paths[1:]:
+            # Sources stay open until the merged file is written
+            src = stack.enter_context(pikepdf.open(path))
+            pdf.pages.extend(src.pages)
+        if original:
+            src = stack.enter_context(pikepdf.open(original))
+            copy_document(src, pdf)
+        pdf.save(output_path)
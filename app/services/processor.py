@@ -1,163 +1,734 @@
+import itertools
 import logging
 import os
-import subprocess
+import shutil
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
-from enum import Enum
+from collections import OrderedDict
 
 from config import Config
 
-from .functions import format_size
+from .core_budget import CoreBudget
+from .job import FINISHED, FOLDER_OWNER, OCR_STAGES, Chunk, Job, PageRate, Status
+from .job_journal import JobJournal
+from .job_queue import JobQueue
+from .metrics import (Gauge, add_file_seconds, files_done, job_pages_per_second, job_seconds, job_size_ratio, jobs_total,
+                      ocr_cpu_seconds, ocr_peak_rss_bytes, ocr_run_seconds, pages_done, pages_total, queue_wait_seconds,
+                      registry)
+from .ocr_engine import OcrCancelled, OcrEngine, OcrTimeout
+from .pdf_shards import count_pages, extract_pages, join_pdfs, split_pdf
+from .publish import discard, publish_file, published, scratch_file
+from .result_cache import ResultCache
+from .scheduling import make_policy
+from .update_bus import ALL, UpdateBus
+from .worker_pool import WorkerPool
 
 
-class Status(Enum):
-    """Status values used during file processing"""
-    NEW = "New"
-    WAITING = "Waiting"
-    PROCESSING = "Processing"
-    DONE = "Done"
-    ERROR = "Error"
+MAX_OWNER_HINTS = 10000  # owners remembered for uploads whose file has not been queued yet
 
 
 class Processor:
     """Processor manages the OCR workflow for input files."""
 
     def __init__(self):
-        # List of dicts: {name, path, status, size}
-        self.files = []
+        # Dict of job id -> Job, in insertion order
+        self.files = {}
+        # Index of jobs by status: Status -> {job id: job}
+        self._by_status = {status: {} for status in Status}
+        # Finished jobs in the order they finished, evicted by count and age (Config.keep_finished_*)
+        self._finished = OrderedDict()
+        self._settings = {}  # one shared dict per distinct OCR settings
+        self._version = 0  # bumped on every change of the job list
+        self._snapshot = (-1, ())  # (version, rows) of the last get_file_list
+        self._page_rate = PageRate(samples=32)  # recent OCR speed of all jobs, for ETAs before a job's first page
+        self.queue = JobQueue()
+        self.pool = WorkerPool(self.queue, self._run_job, name="OCRWorker")
+        self.cores = CoreBudget(Config.cpu_cores)
+        self.engine = OcrEngine(Config.worker_max_jobs, Config.worker_max_memory_mb, Config.ocr_page_timeout,
+                                Config.ocr_job_timeout)
+        self.cache = ResultCache(Config.CACHE_DIR, Config.cache_max_mb)
         self.lock = threading.Lock()
-        self._callbacks = []  # list of subscribed functions
+        self._ids = itertools.count(1)
+        self._active = 0  # OCR runs in progress (files and chunks)
+        self._active_paths = {}  # input path -> unfinished job, so a file is never queued twice
+        self._owners = OrderedDict()  # input path without extension -> owner of a file being uploaded
+        self.journal = None  # JobJournal, opened by start()
+        self.backlog = {"found": 0, "finished": True}  # progress of the input folder scan at startup
+        self.bus = UpdateBus()  # UI clients subscribe here for change notifications
+        self.coordinator = None  # NodeCoordinator when several instances share the input folder
 
-    def subscribe(self, callback):
-        """UI can register a callback for updates"""
-        self._callbacks.append(callback)
+    def _notify(self, job: Job = None):
+        """Tell UI clients that a job (or, without a job, the whole list) changed; never blocks on UI work"""
+        self.bus.publish("jobs", job.id if job else ALL)
+        if job is None or job.status == Status.DONE:
+            self.bus.publish("outputs")
 
-    def _notify(self):
-        """Call all registered callbacks"""
-        for cb in self._callbacks:
+    def add_files(self, paths: list):
+        """Add a batch of files, notifying the UI once if any was new"""
+        version = self._version
+        for path in paths:
             try:
-                cb()
+                self.add_file(path, notify=False)
             except Exception as e:
-                logging.error(f"Callback error: {e}")
+                logging.error(f"Could not queue {path}: {e}")
+        if self._version != version:
+            self._notify()
+
+    def set_backlog_progress(self, found: int, finished: bool):
+        """Progress of the startup scan of the input folder"""
+        self.backlog = {"found": found, "finished": finished}
+        self.bus.publish("backlog")
+
+    def set_owner(self, path: str, owner: str):
+        """
+        Attribute a file about to arrive in the input folder to an owner (e.g. a browser session) for fair-share
+        scheduling. The extension is ignored, so a PDF converted from an uploaded image keeps the owner.
+        """
+        with self.lock:
+            self._owners[os.path.splitext(path)[0]] = owner
+            while len(self._owners) > MAX_OWNER_HINTS:
+                self._owners.popitem(last=False)
 
-    def add_file(self, path: str):
+    def configure_scheduling(self):
+        """Apply the scheduling policy from Config to the queue, keeping queued jobs"""
+        self.queue.set_policy(make_policy(Config.schedule_policy, Config.schedule_aging, Config.schedule_session_weight))
+
+    def add_file(self, path: str, notify: bool = True):
         """Add a new file to the processing queue"""
         if not os.path.exists(path) or not path.lower().endswith('.pdf'):
             return
+        if path in self._active_paths:
+            return  # already queued (e.g. resumed from the journal)
 
+        start = time.perf_counter()
         filename = os.path.basename(path)
-        c = 0
-        while True:
-            size = os.path.getsize(path)
-            if size > 0:
-                break
-            time.sleep(0.1)
-            c -= 1
-            if c <= 0:
-                logging.error(msg=f"Nie uało się załadować pliku {filename}")
-                return
+        # DirectoryWatcher only reports files once they are fully written
+        size = os.path.getsize(path)
+        if size == 0:
+            logging.error(msg=f"Empty file skipped: {filename}")
+            return
 
         # logging.info(f"PATH={path}")
         # logging.info(f"SIZE={size}")
         # logging.info(f"NAME={filename}")
 
+        try:
+            pages = count_pages(path)
+        except Exception:
+            pages = None  # unreadable here, ocrmypdf will report the problem
+
+        # OCR settings are fixed when the file is queued
+        Config.load_config()
+        with self.lock:
+            owner = self._owners.pop(os.path.splitext(path)[0], FOLDER_OWNER)
+        job = Job(filename, path, size, pages=pages, settings=self.ocr_settings(), owner=owner)
+        self._enqueue(job, notify=notify)
+        add_file_seconds.observe(time.perf_counter() - start)
+
+    def _shared_settings(self, settings: dict):
+        """Return one shared dict per distinct settings, so queued jobs don't each hold a copy (caller holds the lock)"""
+        if settings is None:
+            return None
+        return self._settings.setdefault(tuple(sorted(settings.items())), settings)
+
+    def _enqueue(self, job: Job, notify: bool = True):
+        """Register a NEW job and hand it to the workers"""
         with self.lock:
-            self.files.append({
-                "name": filename,
-                "path": path,
-                "status": Status.NEW,
-                "size": format_size(size)
-            })
-        self._notify()  # notify UI about new file
+            if job.path in self._active_paths:
+                return
+            if job.id is None:
+                job.id = next(self._ids)
+            job.settings = self._shared_settings(job.settings)
+            self.files[job.id] = job
+            self._by_status[Status.NEW][job.id] = job
+            self._active_paths[job.path] = job
+            self._version += 1
+            if self.journal:
+                self.journal.record(job)
+        self.queue.put(job)  # wakes up a free worker immediately
+        if notify:
+            self._notify(job)  # notify UI about new file
+
+    def _set_status(self, job: Job, status: Status):
+        """Move job to a new status, keep index and journal in sync and notify the UI (caller holds the lock)"""
+        self._by_status[job.status].pop(job.id, None)
+        first_start = status == Status.PROCESSING and job.started_at is None
+        job.set_status(status)
+        if first_start:
+            queue_wait_seconds.observe(job.started_at - job.queued_at)
+        if status in FINISHED:
+            self._record_finished(job)
+        if self.files.get(job.id) is job:  # skip jobs removed by clear_files
+            self._by_status[status][job.id] = job
+            if status in FINISHED:
+                self._finished[job.id] = job
+                self._evict_finished()
+        if status in FINISHED and self._active_paths.get(job.path) is job:
+            del self._active_paths[job.path]
+        self._version += 1
+        if self.journal:
+            self.journal.record(job)
+        self._notify(job)
+
+    @staticmethod
+    def _record_finished(job: Job):
+        """Update the job metrics with the timing record of a finished job"""
+        label = job.status.name.lower()
+        jobs_total.inc(status=label)
+        timings = job.timings()
+        if job.started_at:
+            job_seconds.observe(timings["processing_s"], status=label)
+        if job.status != Status.DONE:
+            return
+        files_done.add()
+        if job.pages:
+            pages_total.inc(job.pages)
+            pages_done.add(job.pages)
+        if timings["pages_per_s"] is not None:
+            job_pages_per_second.observe(timings["pages_per_s"])
+        if timings["size_ratio"] is not None:
+            job_size_ratio.observe(timings["size_ratio"])
+        logging.info(f"Timing of {job.name}: {timings}")
+
+    def _evict_finished(self):
+        """Forget finished jobs beyond Config.keep_finished_jobs or older than Config.keep_finished_hours (caller holds the lock)"""
+        max_age = time.time() - Config.keep_finished_hours * 3600
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if len(self._finished) <= Config.keep_finished_jobs and job.finished_at >= max_age:
+                break
+            del self._finished[job.id]
+            if self.files.get(job.id) is job:
+                del self.files[job.id]
+                self._by_status[job.status].pop(job.id, None)
+                self._version += 1
+                self.bus.publish("jobs", job.id)
 
     def clear_files(self):
-        """Clear the internal file list"""
+        """Clear the internal file list, drop queued jobs and kill running OCR"""
         with self.lock:
+            work_dirs = [job.work_dir for job in self.files.values() if job.work_dir]
+            # Unfinished jobs are cancelled; record them so they are not resumed after a restart
+            for job in list(self._active_paths.values()):
+                self._set_status(job, Status.CANCELLED)
+            self.queue.clear()
             self.files.clear()
+            self._finished.clear()
+            for jobs in self._by_status.values():
+                jobs.clear()
+            self._version += 1
+        self.engine.cancel_all()
+        self._notify()
+        # Chunks of split files that were still queued will never run
+        for work_dir in work_dirs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; returns False when it is unknown or already finished"""
+        with self.lock:
+            job = self.files.get(job_id)
+        if job is None or not self._abort(job, Status.CANCELLED):
+            return False
+        logging.info(f"Cancelled {job.name}")
+        discard(job.path)  # the input folder is rescanned on startup, a cancelled file must not come back
+        return True
+
+    def _abort(self, job: Job, status: Status) -> bool:
+        """
+        End an unfinished job with `status`: its queued file or chunks are dropped and the OCR workers
+        running for it are killed, so their cores are free at once.
+        """
+        with self.lock:
+            if job.status in FINISHED:
+                return False
+            self._set_status(job, status)
+        removed = self.queue.remove(lambda item: item is job or isinstance(item, Chunk) and item.parent is job)
+        chunks = [item for item in removed if isinstance(item, Chunk)]
+        with self.lock:
+            if chunks:
+                job.chunks_left -= len(chunks)
+            last = bool(chunks) and job.chunks_left == 0
+        self.engine.cancel(job.id)
+        if last:
+            self._assemble(job)  # no chunk is left to clean up the work area
+        return True
+
+    def node_status(self) -> dict:
+        """Figures of this instance published in its heartbeat (multi-node mode)"""
+        counts = self.counts()
+        return {
+            "workers": self.pool.size,
+            "queued": len(self.queue),
+            "processing": counts[Status.PROCESSING],
+            "pages_per_minute": round(pages_done.per_minute(), 1),
+            "files_per_minute": round(files_done.per_minute(), 1),
+            "pages_total": pages_total.value(),
+            "files_total": jobs_total.value(status="done"),
+        }
 
     def get_file_list(self):
-        """Return current file list without DONE files"""
-        with self.lock:
-            return [f for f in self.files if f.get("status") != Status.DONE]
-
-    def process_loop(self, max_workers=3):
-        """Main loop: continuously scans for new files and submits them to workers"""
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            while True:
-                file_to_process = None
-                with self.lock:
-                    for f in self.files:
-                        if f["status"] == Status.NEW:
-                            f["status"] = Status.WAITING
-                            file_to_process = f
-                            break
-
-                if file_to_process:
-                    executor.submit(self.process_file, file_to_process)
+        """
+        Return current file list without DONE files, ordered by id.
+        The rows are a read-only snapshot shared by all callers until the list changes.
+        """
+        with self.lock:
+            self._evict_finished()  # age limit also applies while idle
+            version, rows = self._snapshot
+            if version == self._version:
+                return rows
+            jobs = [job for status, by_id in self._by_status.items() if status != Status.DONE for job in by_id.values()]
+            jobs.sort(key=lambda job: job.id)
+            fallback_rate = self._page_rate.average()
+            self._snapshot = (self._version, tuple(job.row(fallback_rate) for job in jobs))
+            return self._snapshot[1]
+
+    def get_rows(self, ids) -> dict:
+        """Return {job id: row or None} for the given ids; None marks jobs that left the processing list"""
+        with self.lock:
+            jobs = {job_id: self.files.get(job_id) for job_id in ids}
+            fallback_rate = self._page_rate.average()
+            return {job_id: job.row(fallback_rate) if job and job.status != Status.DONE else None
+                    for job_id, job in jobs.items()}
+
+    def counts(self) -> dict:
+        """Number of jobs held per status"""
+        with self.lock:
+            return {status: len(by_id) for status, by_id in self._by_status.items()}
+
+    def start(self):
+        """Open the job journal, resume interrupted jobs and start OCR workers sized from Config"""
+        self.cores.resize(Config.cpu_cores)
+        self.engine.configure(Config.worker_max_jobs, Config.worker_max_memory_mb, Config.ocr_page_timeout,
+                              Config.ocr_job_timeout)
+        self.cache.resize(Config.cache_max_mb)
+        self.configure_scheduling()
+        if self.journal is None:
+            self.journal = JobJournal(Config.JOURNAL_FILE)
+            self._ids = itertools.count(self.journal.max_id() + 1)
+            self._resume()
+        self.resize_workers(Config.max_workers)
+
+    def _resume(self):
+        """Re-queue jobs that were waiting or running when the app stopped"""
+        resumed = 0
+        for row in self.journal.unfinished():
+            job = Job(row["name"], row["path"], row["size"], pages=row["pages"], settings=row["settings"], id=row["id"])
+            if os.path.exists(job.path):
+                self._enqueue(job)
+                resumed += 1
+                continue
+
+            if self.coordinator and os.path.dirname(job.path) != self.coordinator.claimed_dir:
+                self.journal.forget(job.id)  # never claimed: another node has processed the file
+                continue
+
+            # Input is gone: OCR finished before the stop unless the output is missing too
+            output_path = row["output_path"] or os.path.join(Config.OUTPUT_DIR, row["name"])
+            with self.lock:
+                if os.path.exists(output_path):
+                    job.output_path = output_path
+                    self._set_status(job, Status.DONE)
+                elif self.coordinator:
+                    self.journal.forget(job.id)  # moved back to the input folder while this node was down
                 else:
-                    time.sleep(1)
+                    self._set_status(job, Status.ERROR)
+        if resumed:
+            logging.info(f"Resumed {resumed} unfinished job(s) from the journal")
+
+    def resize_workers(self, max_workers: int):
+        """Change the number of parallel OCR jobs; running jobs finish before surplus workers exit"""
+        self.pool.resize(max_workers)
+        self.engine.trim(max_workers)
+
+    def _run_job(self, file_to_process: Job | Chunk):
+        """Worker entry point for a dequeued job"""
+        if isinstance(file_to_process, Chunk):
+            self.process_chunk(file_to_process)
+            return
+        with self.lock:
+            if self.files.get(file_to_process.id) is not file_to_process:
+                return  # job was cleared while queued
+        self.process_file(file_to_process)
 
-    def process_file(self, file_to_process: dict):
+    def process_file(self, file_to_process: Job):
         """Process a single file with OCR"""
-        if not os.path.exists(file_to_process["path"]):
-            with self.lock:
-                file_to_process["status"] = Status.ERROR
+        if self.coordinator and not self._claim(file_to_process):
+            return
+        exists = os.path.exists(file_to_process.path)
+        with self.lock:
+            if file_to_process.status in FINISHED:
+                return  # cancelled while queued
+            self._set_status(file_to_process, Status.PROCESSING if exists else Status.ERROR)
+        if not exists:
+            return
+
+        if self._from_cache(file_to_process):
+            return
+
+        if self._shard(file_to_process):
+            return  # chunks are queued, the worker finishing the last one assembles the output
+
+        batch = self._collect_batch(file_to_process)
+        if batch:
+            self.process_batch([file_to_process] + batch)
             return
 
+        self._ocr_whole(file_to_process)
+
+    def _claim(self, job: Job) -> bool:
+        """
+        Take the input file of a queued job for this node before OCR (several instances share the input folder).
+        Returns False and forgets the job when another node took the file first.
+        """
+        if job.status in FINISHED or os.path.dirname(job.path) == self.coordinator.claimed_dir:
+            return True  # cancelled (left to the caller) or claimed before a restart
+        claimed_path = self.coordinator.claim(job.path, prefix=str(job.id))
+        if claimed_path is None:
+            logging.info(f"{job.name} is handled by another node")
+            self._drop(job)
+            return False
+        with self.lock:
+            if self._active_paths.get(job.path) is job:
+                del self._active_paths[job.path]
+                self._active_paths[claimed_path] = job
+            job.path = claimed_path
+            if self.journal:
+                self.journal.record(job)  # a restart resumes the claimed file
+        return True
+
+    def _drop(self, job: Job):
+        """Forget a queued job entirely (its file belongs to another node now)"""
         with self.lock:
-            file_to_process["status"] = Status.PROCESSING
-        self._notify()  # status changed
+            if self.files.get(job.id) is job:
+                del self.files[job.id]
+                self._by_status[job.status].pop(job.id, None)
+            if self._active_paths.get(job.path) is job:
+                del self._active_paths[job.path]
+            self._version += 1
+            if self.journal:
+                self.journal.forget(job.id)
+        self._notify(job)
 
+    def _ocr_whole(self, file_to_process: Job):
+        """OCR a job's file in one run and finish the job"""
+        usage = {}
+        failure = Status.ERROR
         try:
-            output_path = self.run_ocr(file_path=file_to_process["path"])
+            progress = self._progress_handler([(file_to_process, 0, file_to_process.pages)])
+            # Output named after the job: a claimed input file carries a prefix
+            output_path = os.path.join(Config.OUTPUT_DIR, file_to_process.name)
+            output_path = self._ocr(file_to_process.path, output_path=output_path, settings=file_to_process.settings,
+                                    usage=usage, progress=progress, owners=(file_to_process.id,))
+        except OcrTimeout:
+            output_path, failure = None, Status.TIMEOUT
         except Exception:
-            with self.lock:
-                file_to_process["status"] = Status.ERROR
-            self._notify()
-            return
+            output_path = None
+        file_to_process.add_usage(usage)
+        self._finish(file_to_process, output_path, failure)
 
+    def _finish(self, file_to_process: Job, output_path, failure: Status = Status.ERROR):
+        """Mark a job DONE if its output exists, otherwise with the `failure` status"""
+        with self.lock:
+            if file_to_process.status in FINISHED:
+                return  # cancelled or timed out meanwhile
         if output_path and os.path.exists(output_path):
             try:
                 size_after = os.path.getsize(output_path)
             except OSError:
                 size_after = 0
             with self.lock:
-                file_to_process["size_after"] = size_after
-                file_to_process["output_path"] = output_path
-                file_to_process["status"] = Status.DONE
-            self._notify()
+                file_to_process.size_after = size_after
+                file_to_process.output_path = output_path
+                self._set_status(file_to_process, Status.DONE)
+            if file_to_process.cache_key:
+                self.cache.put(file_to_process.cache_key, output_path)
+        else:
+            with self.lock:
+                self._set_status(file_to_process, failure)
+
+    def _from_cache(self, file_to_process: Job) -> bool:
+        """Serve the output from the result cache if this input was OCR'd before with the same settings"""
+        if not self.cache.enabled:
+            return False
+        try:
+            key = self.cache.key(file_to_process.path, file_to_process.settings or self.ocr_settings())
+        except OSError as e:
+            logging.warning(f"Could not hash {file_to_process.path}: {e}")
+            return False
+
+        output_path = os.path.join(Config.OUTPUT_DIR, file_to_process.name)
+        if not self.cache.get(key, output_path):
+            file_to_process.cache_key = key  # store the result once OCR is done
+            return False
+
+        logging.info(f"Cache hit: {file_to_process.path}")
+        os.remove(file_to_process.path)
+        self._finish(file_to_process, output_path)
+        return True
+
+    def _progress_handler(self, targets: list):
+        """
+        Progress callback for one OCR run, applying the pages it reports to the jobs it covers.
+
+        :param targets: (job, first page of the job in the run, its number of pages or None) per job
+        """
+        last = [0.0]  # pages of the run done at the previous report
+
+        def pages_of(job_pages, first, done):
+            done = max(0.0, done - first)
+            return min(done, job_pages) if job_pages else done
+
+        def on_progress(event):
+            stage = event.get("desc") or "Processing"
+            done = (event.get("done") or 0.0) if stage in OCR_STAGES else last[0]
+            with self.lock:
+                for job, first, job_pages in targets:
+                    delta = pages_of(job_pages, first, done) - pages_of(job_pages, first, last[0])
+                    sample = job.advance(stage, delta)
+                    if sample:
+                        self._page_rate.add(*sample)
+                    self.bus.publish("jobs", job.id)
+                self._version += 1
+            last[0] = done
+
+        return on_progress
+
+    def _ocr(self, file_path: str, output_path: str = None, settings: dict = None, usage: dict = None, progress=None,
+             owners: tuple = ()):
+        """Run OCR with a share of the core budget"""
+        cores = 0
+        try:
+            with self.lock:
+                self._active += 1
+                active = self._active
+            # Runs that will compete for cores: active ones plus the backlog, up to the pool size
+            demand = min(self.pool.size, active + len(self.queue))
+            cores = self.cores.acquire(demand)
+            return self.run_ocr(file_path=file_path, jobs=cores, output_path=output_path, settings=settings, usage=usage,
+                                progress=progress, owners=owners)
+        finally:
+            if cores:
+                self.cores.release(cores)
+            with self.lock:
+                self._active -= 1
+
+    def _shard(self, file_to_process: Job) -> bool:
+        """
+        Split a large PDF into page-range chunks and queue them for the worker pool.
+        Returns False when the file should be processed whole.
+        """
+        pages = file_to_process.pages
+        if Config.shard_pages <= 0 or not pages or pages <= Config.shard_pages:
+            return False
+
+        work_dir = os.path.join(Config.WORK_DIR, f"shard_{file_to_process.id}")
+        split_marker = os.path.join(work_dir, "split.done")
+        try:
+            if os.path.exists(split_marker):
+                # Split before a restart: keep chunks that were already OCR'd
+                with open(split_marker, "r") as f:
+                    count = int(f.read())
+                chunk_paths = [os.path.join(work_dir, f"chunk_{i:05d}.pdf") for i in range(1, count + 1)]
+                logging.info(f"Resuming split file {file_to_process.name} ({count} chunks)")
+            else:
+                chunk_paths = split_pdf(file_to_process.path, max(1, Config.shard_chunk_pages), work_dir)
+                with open(split_marker, "w") as f:
+                    f.write(str(len(chunk_paths)))
+                logging.info(f"Split {file_to_process.name} ({pages} pages) into {len(chunk_paths)} chunks")
+        except Exception as e:
+            logging.warning(f"Could not split {file_to_process.path}, processing it whole: {e}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return False
+
+        chunks = [
+            Chunk(file_to_process, chunk_path, output_path=os.path.splitext(chunk_path)[0] + "_ocr.pdf")
+            for chunk_path in chunk_paths
+        ]
+        # run_ocr removes a chunk's input only after it was OCR'd
+        pending = [chunk for chunk in chunks if os.path.exists(chunk.path) or not os.path.exists(chunk.output_path)]
+        with self.lock:
+            file_to_process.work_dir = work_dir
+            file_to_process.chunks = chunks
+            file_to_process.chunks_left = len(pending)
+            file_to_process.chunks_failed = 0
+        if not pending:
+            self._assemble(file_to_process)
+        for chunk in pending:
+            self.queue.put(chunk)
+        return True
+
+    def process_chunk(self, chunk: Chunk):
+        """OCR one chunk of a split file; the last chunk to finish assembles the output"""
+        parent = chunk.parent
+        output_path = None
+        timed_out = False
+        usage = {}
+        with self.lock:
+            dropped = self.files.get(parent.id) is not parent or parent.status in FINISHED
+        if not dropped:
+            try:
+                output_path = self._ocr(chunk.path, output_path=chunk.output_path, settings=parent.settings, usage=usage,
+                                        progress=self._progress_handler([(parent, 0, None)]), owners=(parent.id,))
+            except OcrTimeout:
+                timed_out = True
+            except OcrCancelled:
+                pass  # the whole file was cancelled or timed out
+            except Exception as e:
+                logging.error(f"Chunk {chunk.path} failed: {e}")
 
-    def run_ocr(self, file_path: str):
-        """Run OCRmyPDF on the given file"""
+        with self.lock:
+            parent.add_usage(usage)
+            parent.chunks_left -= 1
+            if not output_path:
+                parent.chunks_failed += 1
+            last = parent.chunks_left == 0
+        if timed_out:
+            # The file cannot be assembled anymore, free the cores of its other chunks
+            logging.error(f"Chunk {chunk.path} timed out, giving up on {parent.name}")
+            if self._abort(parent, Status.TIMEOUT):
+                discard(parent.path)
+        if last:
+            self._assemble(parent)
+
+    def _assemble(self, file_to_process: Job):
+        """Join OCR'd chunks in page order into the output file under the original name"""
+        output_path = None
+        try:
+            if file_to_process.status in FINISHED:
+                logging.info(f"Dropped the chunks of {file_to_process.name} ({file_to_process.status.value})")
+            elif file_to_process.chunks_failed == 0:
+                output_path = os.path.join(Config.OUTPUT_DIR, file_to_process.name)
+                with published(output_path) as tmp_path:
+                    join_pdfs([chunk.output_path for chunk in file_to_process.chunks], tmp_path,
+                              original=file_to_process.path)
+                os.remove(file_to_process.path)
+                logging.info(f"Processed successfully: {file_to_process.path} ({len(file_to_process.chunks)} chunks)")
+            else:
+                logging.error(f"{file_to_process.chunks_failed} chunk(s) of {file_to_process.path} failed")
+        except Exception as e:
+            logging.error(f"Could not assemble {file_to_process.path}: {e}")
+            output_path = None
+        finally:
+            shutil.rmtree(file_to_process.work_dir, ignore_errors=True)
+        self._finish(file_to_process, output_path)
+
+    def _is_small(self, job) -> bool:
+        """Whether a queued file is small enough to be OCR'd as part of a batch"""
+        return isinstance(job, Job) and bool(job.pages) and job.pages <= Config.batch_small_pages
+
+    def _collect_batch(self, file_to_process: Job) -> list:
+        """
+        Take other small queued files with the same OCR settings to process together with this one.
+        Waits up to Config.batch_max_wait seconds for a partial batch to fill up.
+        """
+        if Config.batch_size <= 1 or not self._is_small(file_to_process):
+            return []
+
+        settings = file_to_process.settings
+        batch = self.queue.take(
+            lambda job: self._is_small(job) and job.settings is settings,
+            limit=Config.batch_size - 1,
+            timeout=Config.batch_max_wait,
+        )
+
+        with self.lock:
+            # Skip jobs cleared or cancelled while queued
+            batch = [job for job in batch if self.files.get(job.id) is job and job.status not in FINISHED]
+        if self.coordinator:
+            batch = [job for job in batch if self._claim(job)]
+        with self.lock:
+            for job in batch:
+                self._set_status(job, Status.PROCESSING)
+        return [job for job in batch if not self._from_cache(job)]
+
+    def process_batch(self, batch: list):
+        """OCR several small files in one run, then split the result back into one output per file"""
+        batch_id = batch[0].id
+        batch_path = scratch_file(f"batch_{batch_id}.pdf")
+        batch_output = scratch_file(f"batch_{batch_id}_ocr.pdf")
+        logging.info(f"Processing batch of {len(batch)} files: {', '.join(job.name for job in batch)}")
+
+        output_path = None
+        usage = {}
+        try:
+            join_pdfs([job.path for job in batch], batch_path)
+            targets, first = [], 0
+            for job in batch:
+                targets.append((job, first, job.pages))
+                first += job.pages
+            output_path = self._ocr(batch_path, output_path=batch_output, settings=batch[0].settings, usage=usage,
+                                    progress=self._progress_handler(targets), owners=tuple(job.id for job in batch))
+        except Exception as e:
+            logging.error(f"Batch {batch_id} failed: {e}")
+
+        if not output_path:
+            # One bad file must not fail the others: fall back to processing them one by one
+            logging.warning(f"Batch {batch_id} failed, processing its files separately")
+            for path in (batch_path, batch_output):
+                discard(path)
+            for job in batch:
+                if job.status not in FINISHED:  # skip jobs cancelled during the batch
+                    self._ocr_whole(job)
+            return
+
+        start = 0
+        total_pages = sum(job.pages for job in batch)
+        for job in batch:
+            job.add_usage(usage, share=job.pages / total_pages)  # the run is shared in proportion to pages
+            stop = start + job.pages
+            job_output = os.path.join(Config.OUTPUT_DIR, job.name)
+            try:
+                with published(job_output) as tmp_path:
+                    extract_pages(output_path, start, stop, tmp_path, original=job.path)
+                os.remove(job.path)
+            except Exception as e:
+                logging.error(f"Could not split {job.name} out of batch {batch_id}: {e}")
+                job_output = None
+            start = stop
+            self._finish(job, job_output)
+        discard(output_path)
+
+    def run_ocr(self, file_path: str, jobs: int = 1, output_path: str = None, settings: dict = None, usage: dict = None,
+                progress=None, owners: tuple = ()):
+        """
+        Run OCRmyPDF on the given file using `jobs` cores (output goes to OUTPUT_DIR unless given).
+        Wall time, CPU time and peak memory of the run are put into `usage` when given;
+        `progress` is called with the progress events of the run.
+        Raises OcrTimeout or OcrCancelled when the run was killed; `owners` are the ids of the jobs it works for.
+        """
         logging.info(f"Processing new file: {file_path}")
 
-        Config.load_config()
-        ocr_output_path = os.path.join(Config.OUTPUT_DIR, os.path.basename(file_path))
+        if settings is None:
+            Config.load_config()
+            settings = self.ocr_settings()
+        ocr_output_path = output_path or os.path.join(Config.OUTPUT_DIR, os.path.basename(file_path))
         # Optional text extraction path (disabled):
         # text_output_path = os.path.join(Config.OUTPUT_DIR, os.path.splitext(os.path.basename(file_path))[0] + ".txt")
 
-        command = [
-            "ocrmypdf",
-            "--image-dpi", str(Config.image_dpi),
-            "--optimize", str(Config.optimize),
-            "--tesseract-oem", "1",
-            "--clean",
-            "--output-type", "pdfa-2",
-            "--redo-ocr",
-            "-l", str(Config.language),
-            file_path,
-            ocr_output_path,
-        ]
-        logging.info(f"Command: {" ".join(command)}")
+        options = self.ocr_options(settings, jobs=jobs)
+        logging.info(f"OCR options: {options}")
 
+        # OCR into the scratch area; the output appears under its final name only once complete
+        scratch_output = scratch_file(ocr_output_path)
         try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            os.remove(file_path)
+            start = time.perf_counter()
+            result = self.engine.run(file_path, scratch_output, options, on_progress=progress, owners=owners)
+            wall = time.perf_counter() - start
 
-            if result.returncode != 0:
-                logging.error(f"OCRmyPDF failed ({result.returncode}) for {file_path}: {result.stderr}")
+            ocr_run_seconds.observe(wall, result="ok" if result["ok"] else "error")
+            ocr_cpu_seconds.observe(result.get("cpu_s", 0))
+            ocr_peak_rss_bytes.observe(result.get("peak_rss_kb", 0) * 1024)
+            if usage is not None:
+                usage.update(wall_s=wall, cpu_s=result.get("cpu_s", 0), peak_rss_kb=result.get("peak_rss_kb", 0))
+
+            if not result["ok"]:
+                os.remove(file_path)
+                logging.error(f"OCRmyPDF failed for {file_path}: {result['error']}")
                 return None
+            # The input goes only once the output is in place: publishing from a tmpfs scratch area is a copy,
+            # and a crash during it must leave the file to be resumed
+            publish_file(scratch_output, ocr_output_path)
+            os.remove(file_path)
 
             # Optional: text extraction (disabled)
             # text_result = subprocess.run(["pdftotext", "-layout", ocr_output_path, text_output_path], capture_output=True, text=True)
@@ -167,10 +738,55 @@ class Processor:
             logging.info(f"Processed successfully: {file_path}")
             return ocr_output_path
 
+        except OcrTimeout as e:
+            ocr_run_seconds.observe(time.perf_counter() - start, result="timeout")
+            logging.error(f"{e}: {file_path}")
+            discard(file_path)  # dropped like the input of a failed run, it would only time out again
+            raise
+        except OcrCancelled:
+            ocr_run_seconds.observe(time.perf_counter() - start, result="cancelled")
+            logging.info(f"OCR cancelled: {file_path}")
+            raise
         except Exception as e:
             logging.error(f"Unexpected error processing {file_path}: {e}")
             return None
+        finally:
+            discard(scratch_output)
+
+    @staticmethod
+    def ocr_settings() -> dict:
+        """User settings that affect the OCR result"""
+        return {
+            "language": str(Config.language),
+            "image_dpi": Config.image_dpi,
+            "optimize": Config.optimize,
+        }
+
+    @staticmethod
+    def ocr_options(settings: dict, jobs: int = 1) -> dict:
+        """
+        Keyword arguments for ocrmypdf.ocr(), equivalent to:
+        ocrmypdf --image-dpi N --optimize N --tesseract-oem 1 --jobs N --clean --output-type pdfa-2 --redo-ocr -l LANG
+        """
+        return {
+            "image_dpi": settings["image_dpi"],
+            "optimize": settings["optimize"],
+            "tesseract_oem": 1,
+            "jobs": jobs,
+            "clean": True,
+            "output_type": "pdfa-2",
+            "redo_ocr": True,
+            "language": settings["language"].split("+"),
+            "progress_bar": False,
+        }
 
 
 # Global processor instance
 processor = Processor()
+
+registry.register(Gauge("ocr_machine_jobs", "Jobs held in memory by status",
+                        lambda: {(status.name.lower(),): count for status, count in processor.counts().items()},
+                        labelnames=("status",)))
+registry.register(Gauge("ocr_machine_queue_length", "Files and chunks waiting for a worker", lambda: len(processor.queue)))
+registry.register(Gauge("ocr_machine_ocr_runs_active", "OCR runs in progress", lambda: processor._active))
+registry.register(Gauge("ocr_machine_workers", "Configured number of OCR workers", lambda: processor.pool.size))
@@ -0,0 +1,133 @@
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from config import Config
+
+from .downloads import digests
+
+
+def _file_mode() -> int:
+    """Mode of a file created with open() under the current umask (mkstemp files are 0600)"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+FILE_MODE = _file_mode()  # read once at import: os.umask() cannot be queried without setting it
+
+
+def scratch_dir() -> str:
+    """Directory for work in progress (Config.scratch_dir, ideally a tmpfs), created on demand"""
+    path = Config.scratch_dir or os.path.join(Config.WORK_DIR, "scratch")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def scratch_file(name: str) -> str:
+    """Reserve a unique scratch file named after `name`"""
+    fd, path = tempfile.mkstemp(prefix=".", suffix=f"-{os.path.basename(name)}", dir=scratch_dir())
+    os.close(fd)
+    return path
+
+
+def scratch_subdir() -> str:
+    """Create a unique scratch directory"""
+    return tempfile.mkdtemp(dir=scratch_dir())
+
+
+def discard(path: str):
+    """Remove a scratch file if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Could not remove {path}: {e}")
+
+
+def purge_stale(directories: list, min_age: float = 0):
+    """
+    Remove what an interrupted run left behind: the contents of the scratch area and the hidden
+    .part files of publishes and uploads in `directories` (resumable uploads, .upload-*.part, are kept).
+    Entries modified within the last `min_age` seconds are kept, another instance may still write them.
+    """
+    def is_temp(name: str) -> bool:
+        return name.startswith(".") and name.endswith(".part") and not name.startswith(".upload-")
+
+    now = time.time()
+    scratch = scratch_dir()
+    stale = []
+    for directory in [scratch, *directories]:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if ((directory == scratch or is_temp(entry.name))
+                                and now - entry.stat(follow_symlinks=False).st_mtime >= min_age):
+                            stale.append(entry.path)
+                    except OSError:
+                        pass
+        except FileNotFoundError:
+            pass
+    for path in stale:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            discard(path)
+    if stale:
+        logging.info(f"Removed {len(stale)} leftover temporary files")
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish_file(src: str, final_path: str):
+    """
+    Move a finished file to final_path so readers see either nothing or the complete file.
+    The data is fsync'd, given the usual mode of new files and renamed into place; from another filesystem it is first copied
+    to a hidden temporary file next to final_path.
+    """
+    directory = os.path.dirname(final_path)
+    _fsync(src)
+    if os.stat(src).st_dev == os.stat(directory).st_dev:
+        os.chmod(src, FILE_MODE)
+        os.replace(src, final_path)
+    else:
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(final_path)}.", suffix=".part", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as dst, open(src, "rb") as f:
+                shutil.copyfileobj(f, dst, 1024 * 1024)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.chmod(tmp_path, FILE_MODE)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            discard(tmp_path)
+            raise
+        os.remove(src)
+    _fsync(directory)  # make the rename itself durable
+    if Config.download_digests and directory == os.path.normpath(Config.OUTPUT_DIR):
+        digests.schedule(final_path)
+
+
+@contextlib.contextmanager
+def published(final_path: str):
+    """
+    Yield a scratch path to write a work product to. When the block completes
+    the file is published to final_path; on an exception it is deleted instead.
+    """
+    path = scratch_file(final_path)
+    try:
+        yield path
+        publish_file(path, final_path)
+    finally:
+        discard(path)
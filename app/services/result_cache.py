@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+from .publish import published
+
+
+def ocrmypdf_version() -> str:
+    """Installed ocrmypdf version, part of the cache key so upgrades invalidate old results"""
+    try:
+        return metadata.version("ocrmypdf")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class ResultCache:
+    """Disk-backed cache of OCR outputs keyed by input content and OCR settings, LRU-evicted by size"""
+
+    def __init__(self, cache_dir: str, max_size_mb: int):
+        """
+        :param cache_dir: directory holding cached outputs (<key>.pdf)
+        :param max_size_mb: total size limit (0 = cache disabled)
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 ** 2
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._size = 0
+        self._version = ocrmypdf_version()
+        self._load()
+
+    def _load(self):
+        """Index existing cache files, oldest access first"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def resize(self, max_size_mb: int):
+        """Change the size limit and evict down to it"""
+        with self._lock:
+            self.max_size = max_size_mb * 1024 ** 2
+            self._evict()
+
+    def key(self, input_path: str, settings: dict) -> str:
+        """Hash of the input bytes, OCR settings and ocrmypdf version"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        digest.update(self._version.encode())
+        with open(input_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key: str, output_path: str) -> bool:
+        """Copy a cached result to output_path; return False on a miss"""
+        with self._lock:
+            found = key in self._entries
+            if found:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not found:
+            return False
+
+        try:
+            with published(output_path) as tmp_path:
+                shutil.copyfile(self._path(key), tmp_path)
+            os.utime(self._path(key))  # keeps LRU order across restarts
+            return True
+        except OSError as e:
+            logging.warning(f"Cache entry {key} unusable: {e}")
+            with self._lock:
+                self._drop(key)
+            return False
+
+    def put(self, key: str, output_path: str):
+        """Store an OCR result"""
+        if not self.enabled:
+            return
+        tmp_path = None
+        try:
+            # Unique temporary name: several instances may share the cache directory
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{key}.", suffix=".tmp", dir=self.cache_dir)
+            os.close(fd)
+            shutil.copyfile(output_path, tmp_path)
+            os.replace(tmp_path, self._path(key))
+            size = os.path.getsize(self._path(key))
+        except OSError as e:
+            logging.warning(f"Could not cache {output_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def _drop(self, key: str):
+        """Remove one entry (caller holds the lock)"""
+        self._size -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits (caller holds the lock)"""
+        while self._entries and self._size > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "size": self._size}
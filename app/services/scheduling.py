@@ -0,0 +1,158 @@
+import heapq
+import itertools
+from collections import deque
+
+from .job import FOLDER_OWNER, Chunk
+
+PAGE_BYTES = 200 * 1024  # assumed size of a page when a file's page count is unknown
+
+
+def job_of(item):
+    """The Job a queued item belongs to (a Job itself, or the parent of a Chunk)"""
+    return item.parent if isinstance(item, Chunk) else item
+
+
+def estimated_pages(job) -> float:
+    """Estimated OCR cost of a whole job in pages, from its page count or else its size"""
+    if job.pages:
+        return job.pages
+    return max(1.0, (job.size or 0) / PAGE_BYTES)
+
+
+def cost(item) -> float:
+    """Estimated OCR cost of one queued item in pages; a chunk is its share of the file"""
+    job = job_of(item)
+    if isinstance(item, Chunk):
+        return estimated_pages(job) / max(1, len(job.chunks or ()))
+    return estimated_pages(job)
+
+
+class FifoPolicy:
+    """Jobs in the order they were queued"""
+    name = "fifo"
+
+    def __init__(self):
+        self._items = deque()
+
+    def push(self, item):
+        self._items.append(item)
+
+    def pop(self):
+        return self._items.popleft()
+
+    def remove(self, predicate) -> list:
+        removed = [item for item in self._items if predicate(item)]
+        if removed:
+            self._items = deque(item for item in self._items if not predicate(item))
+        return removed
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ShortestJobFirst:
+    """
+    Smallest estimated job first, with aging: every minute in the queue counts as `aging` pages less,
+    so large jobs are not starved by a steady stream of small ones.
+    The chunks of a split file keep the place of their file, so a started file is finished first.
+    """
+    name = "sjf"
+
+    def __init__(self, aging: float = 10.0):
+        self.aging = aging
+        self._heap = []  # (key, sequence, item)
+        self._seq = itertools.count()
+
+    def key(self, item) -> float:
+        # Aged priority is pages - aging * waited minutes; "now" is the same for all jobs, so the order only
+        # depends on pages + aging * minutes of the queueing time, which never changes while queued
+        job = job_of(item)
+        return estimated_pages(job) + self.aging * job.queued_at / 60
+
+    def push(self, item):
+        heapq.heappush(self._heap, (self.key(item), next(self._seq), item))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def remove(self, predicate) -> list:
+        removed = [entry[2] for entry in self._heap if predicate(entry[2])]
+        if removed:
+            self._heap = [entry for entry in self._heap if not predicate(entry[2])]
+            heapq.heapify(self._heap)
+        return removed
+
+    def __iter__(self):
+        # Heap order: roughly, not strictly, the dispatch order
+        return (entry[2] for entry in self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class FairShare:
+    """
+    Weighted fair share between owners (browser sessions uploading files, the input folder):
+    the owner with the fewest pages served per weight goes next, shortest job first within an owner.
+    An owner that becomes active starts level with the others instead of cashing in its idle time.
+    """
+    name = "fair"
+
+    def __init__(self, aging: float = 10.0, session_weight: float = 1.0):
+        self.aging = aging
+        self.session_weight = session_weight
+        self._queues = {}  # owner -> ShortestJobFirst, for owners with queued jobs only
+        self._served = {}  # owner -> pages served per weight since it became active
+
+    def weight(self, owner: str) -> float:
+        return 1.0 if owner == FOLDER_OWNER else max(self.session_weight, 0.01)
+
+    def push(self, item):
+        owner = job_of(item).owner
+        queue = self._queues.get(owner)
+        if queue is None:
+            queue = self._queues[owner] = ShortestJobFirst(self.aging)
+            self._served[owner] = min(self._served.values(), default=0.0)
+        queue.push(item)
+
+    def pop(self):
+        owner = min(self._queues, key=self._served.__getitem__)
+        queue = self._queues[owner]
+        item = queue.pop()
+        self._served[owner] += cost(item) / self.weight(owner)
+        if not queue:
+            self._drop(owner)
+        return item
+
+    def _drop(self, owner: str):
+        del self._queues[owner]
+        del self._served[owner]
+
+    def remove(self, predicate) -> list:
+        removed = []
+        for owner, queue in list(self._queues.items()):
+            removed += queue.remove(predicate)
+            if not queue:
+                self._drop(owner)
+        return removed
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._queues.values())
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+
+POLICIES = {policy.name: policy for policy in (FifoPolicy, ShortestJobFirst, FairShare)}
+
+
+def make_policy(name: str, aging: float = 10.0, session_weight: float = 1.0):
+    """Scheduling policy by name ("fifo", "sjf" or "fair"), FIFO for unknown names"""
+    if name == ShortestJobFirst.name:
+        return ShortestJobFirst(aging)
+    if name == FairShare.name:
+        return FairShare(aging, session_weight)
+    return FifoPolicy()
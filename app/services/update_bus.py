@@ -0,0 +1,58 @@
+import threading
+
+ALL = None  # marker: every key of a topic changed
+
+
+class Subscription:
+    """Changes collected for one UI client since it last looked"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = {}  # topic -> set of changed keys, or ALL
+
+    def _add(self, topic: str, key):
+        with self._lock:
+            if key is ALL:
+                self._changes[topic] = ALL
+            elif topic not in self._changes:
+                self._changes[topic] = {key}
+            elif self._changes[topic] is not ALL:
+                self._changes[topic].add(key)
+
+    def take(self) -> dict:
+        """Return and reset the collected changes: {topic: set of keys or ALL}"""
+        with self._lock:
+            changes, self._changes = self._changes, {}
+        return changes
+
+
+class UpdateBus:
+    """
+    Fan-out of change notifications from worker threads to UI clients.
+    Publishing only records what changed; each client applies the coalesced changes
+    on its own timer, so workers never wait for UI work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, topic: str, key=ALL):
+        """Record that `key` of `topic` changed (ALL = refresh the whole topic)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._add(topic, key)
+
+    def __len__(self):
+        return len(self._subscriptions)
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import weakref
+
+from config import Config
+
+from .executor import io_executor
+from .metrics import upload_seconds
+from .publish import FILE_MODE
+
+PARTIAL_MAX_AGE = 24 * 3600  # seconds an abandoned resumable upload is kept
+
+# Partial file path -> lock held while a chunk is written to it (dropped once no request uses it)
+_partial_locks = weakref.WeakValueDictionary()
+
+
+class UploadError(Exception):
+    """Upload rejected; `status` is the matching HTTP status code"""
+
+    def __init__(self, message: str, status: int = 400, offset: int = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def max_upload_bytes() -> int:
+    """Upload size limit from Config (0 = unlimited)"""
+    return Config.upload_max_mb * 1024 * 1024
+
+
+def check_upload_size(size: int):
+    limit = max_upload_bytes()
+    if limit and size > limit:
+        raise UploadError(f"File exceeds the upload limit of {Config.upload_max_mb} MB", status=413)
+
+
+def safe_filename(filename: str) -> str:
+    """Return the bare file name, rejecting names that could escape the target directory or hide the file"""
+    name = os.path.basename(filename or "")
+    if not name or name != filename or name.startswith(".") or "\\" in name:
+        raise UploadError("Invalid filename")
+    return name
+
+
+async def stream_upload(file, save_path: str) -> int:
+    """
+    Stream an uploaded file in chunks to a temporary file next to save_path,
+    then rename it into place so watchers only ever see the complete file.
+
+    :return: size in bytes
+    """
+    check_upload_size(file.size())
+    start = time.perf_counter()
+    directory, name = os.path.split(save_path)
+    # Dot prefix: ignored by the directory index and the input watcher
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".part", dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in file.iterate():
+                size += len(chunk)
+                check_upload_size(size)
+                await io_executor.run(f.write, chunk)
+            await io_executor.run(f.flush)
+        os.chmod(tmp_path, FILE_MODE)  # mkstemp creates files with mode 0600
+        os.replace(tmp_path, save_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    upload_seconds.observe(time.perf_counter() - start, method="form")
+    return size
+
+
+def partial_path(directory: str, filename: str) -> str:
+    """Where the received part of a resumable upload is kept"""
+    digest = hashlib.sha1(filename.encode()).hexdigest()[:16]
+    return os.path.join(directory, f".upload-{digest}.part")
+
+
+def upload_offset(directory: str, filename: str) -> int:
+    """Number of bytes of a resumable upload received so far"""
+    try:
+        return os.path.getsize(partial_path(directory, filename))
+    except OSError:
+        return 0
+
+
+def parse_content_range(header: str):
+    """Parse 'bytes start-end/total' into (start, end, total)"""
+    try:
+        unit, _, spec = header.strip().partition(" ")
+        span, _, total = spec.partition("/")
+        start, _, end = span.partition("-")
+        if unit != "bytes":
+            raise ValueError
+        start, end, total = int(start), int(end), int(total)
+        if start < 0 or end < start or end >= total:
+            raise ValueError
+        return start, end, total
+    except ValueError:
+        raise UploadError(f"Invalid Content-Range: {header}")
+
+
+def remove_stale_partials(directory: str):
+    """Delete resumable uploads abandoned for longer than PARTIAL_MAX_AGE"""
+    now = time.time()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(".upload-") and entry.name.endswith(".part"):
+                try:
+                    if now - entry.stat().st_mtime > PARTIAL_MAX_AGE:
+                        os.remove(entry.path)
+                        logging.info(f"Removed abandoned upload {entry.path}")
+                except OSError:
+                    pass
+
+
+async def write_upload_chunk(directory: str, filename: str, start: int, total: int, chunks) -> int:
+    """
+    Append one chunk of a resumable upload; the chunk must start where the received part ends.
+    Once all `total` bytes have arrived the file is renamed into place.
+
+    :param chunks: async iterator of the chunk's bytes (e.g. request.stream())
+    :return: number of bytes received so far
+    """
+    check_upload_size(total)
+    started = time.perf_counter()
+    path = partial_path(directory, filename)
+    lock = _partial_locks.get(path)
+    if lock is None:
+        lock = _partial_locks[path] = asyncio.Lock()
+    # One chunk at a time per file: a retried chunk waits and is then rejected instead of being appended twice
+    async with lock:
+        offset = await io_executor.run(upload_offset, directory, filename)
+        if start != offset:
+            raise UploadError(f"Upload of {filename} continues at byte {offset}", status=409, offset=offset)
+        if start == 0:
+            await io_executor.run(remove_stale_partials, directory)
+
+        f = await io_executor.run(open, path, "ab")
+        try:
+            async for chunk in chunks:
+                offset += len(chunk)
+                if offset > total:
+                    break
+                await io_executor.run(f.write, chunk)
+        finally:
+            await io_executor.run(f.close)
+        if offset > total:
+            await io_executor.run(os.truncate, path, start)
+            raise UploadError("Chunk extends beyond the declared total size", offset=start)
+
+        if offset == total:
+            await io_executor.run(os.replace, path, os.path.join(directory, filename))
+            logging.info(f"Resumable upload complete: {filename} ({total} bytes)")
+    upload_seconds.observe(time.perf_counter() - started, method="chunk")
+    return offset
@@ -0,0 +1,63 @@
+import logging
+import threading
+
+
+class WorkerPool:
+    """Pool of worker threads pulling jobs from a JobQueue, resizable at runtime"""
+
+    def __init__(self, queue, handler, name="Worker"):
+        """
+        :param queue: JobQueue to consume
+        :param handler: callback function(job), run on a worker thread
+        :param name: prefix for worker thread names
+        """
+        self.queue = queue
+        self.handler = handler
+        self.name = name
+        self.size = 0
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._counter = 0
+
+    def resize(self, size: int):
+        """
+        Grow or shrink the pool to `size` workers.
+        Shrinking never interrupts running jobs: surplus workers exit once they are idle.
+        """
+        size = max(0, int(size))
+        with self._lock:
+            delta = size - self.size
+            self.size = size
+            if delta > 0:
+                # Workers that were asked to stop but have not exited yet can simply stay
+                delta -= self.queue.cancel_stop(delta)
+                for _ in range(delta):
+                    self._spawn()
+            elif delta < 0:
+                self.queue.request_stop(-delta)
+        logging.info(f"{self.name} pool resized to {size}")
+
+    def active_count(self):
+        """Return the number of live worker threads (including ones draining after a shrink)"""
+        with self._lock:
+            return len(self._threads)
+
+    def _spawn(self):
+        self._counter += 1
+        thread = threading.Thread(target=self._run, daemon=True, name=f"{self.name}-{self._counter}")
+        self._threads.add(thread)
+        thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    return  # stop request after a shrink
+                try:
+                    self.handler(job)
+                except Exception as e:
+                    logging.error(f"Worker error: {e}")
+        finally:
+            with self._lock:
+                self._threads.discard(threading.current_thread())
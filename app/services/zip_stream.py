@@ -0,0 +1,60 @@
+import logging
+import os
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formats that are compressed already; deflating them again costs CPU and saves nothing
+STORED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz", ".7z"}
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink collecting the bytes zipfile produces until they are sent"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(dir: str, names: list, chunk_size: int = CHUNK_SIZE):
+    """
+    Generate a ZIP archive of the given files of `dir` chunk by chunk.
+    Memory use is bounded by `chunk_size` whatever the size of the archive;
+    ZIP64 records are written for entries and archives that need them.
+    """
+    buffer = _ChunkBuffer()
+    # A non-seekable target makes zipfile write sizes and CRCs after each entry's data
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as archive:
+        for name in names:
+            path = os.path.join(dir, name)
+            try:
+                src = open(path, "rb")
+            except OSError as e:
+                logging.warning(f"Skipping {path} in ZIP download: {e}")
+                continue
+            with src:
+                info = zipfile.ZipInfo.from_file(path, name)
+                if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w") as dst:
+                    while chunk := src.read(chunk_size):
+                        dst.write(chunk)
+                        if data := buffer.drain():
+                            yield data
+            if data := buffer.drain():
+                yield data
+    # Central directory
+    yield buffer.drain()
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from services.dir_index import DirectoryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    for i in range(10):
+        (tmp_path / f"f{i:02d}.pdf").write_bytes(b"x" * (i + 1))
+    index = DirectoryIndex(str(tmp_path))
+    index.scan()
+    return index
+
+
+def names(page):
+    rows, total = page
+    return [row[0] for row in rows], total
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_the_listing_once(index, descending):
+    seen = []
+    for offset in range(0, 10, 4):
+        rows, total = names(index.page(offset=offset, limit=4, descending=descending))
+        assert total == 10
+        seen += rows
+    expected = [f"f{i:02d}.pdf" for i in range(10)]
+    assert seen == (expected[::-1] if descending else expected)
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_page_sorted_by_size(index, descending):
+    rows, _ = names(index.page(offset=0, limit=3, sort_by="size", descending=descending))
+    assert rows == (["f09.pdf", "f08.pdf", "f07.pdf"] if descending else ["f00.pdf", "f01.pdf", "f02.pdf"])
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("offset", [10, 15])
+def test_offset_past_the_end_is_empty(index, offset, descending):
+    assert names(index.page(offset=offset, limit=5, descending=descending)) == ([], 10)
+
+
+def test_hidden_files_are_not_listed(index):
+    open(os.path.join(index.path, ".upload.part"), "wb").close()
+    index.scan()
+    assert names(index.page())[1] == 10
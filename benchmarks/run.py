@@ -0,0 +1,518 @@
+"""
+Benchmarks for the OCR pipeline.
+
+Runs the app's services against synthetic inputs, with OCR workers loading the
+stub ocrmypdf from benchmarks/stub (a fixed time per page instead of tesseract),
+and writes the results as JSON so runs can be compared across commits:
+
+    python benchmarks/run.py                          # all benchmarks, results/<date>-<commit>.json
+    python benchmarks/run.py --quick dispatch listing
+    python benchmarks/run.py --compare results/before.json
+
+Jobs run in a temporary data directory, never in the real /data.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUB_DIR = os.path.join(BENCH_DIR, "stub")
+sys.path.insert(0, os.path.join(REPO_DIR, "app"))
+
+# OCR worker processes inherit the environment, so they import the stub ocrmypdf
+os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [STUB_DIR, os.environ.get("PYTHONPATH")]))
+
+from config import Config  # noqa: E402
+
+from synthetic import make_files, make_images, make_pdfs  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register a benchmark function(root, args) -> dict of results"""
+    BENCHMARKS[func.__name__.removeprefix("bench_")] = func
+    return func
+
+
+def configure(root: str):
+    """Point Config at a fresh data directory with defaults suited for measuring"""
+    Config.DATA_DIR = root
+    Config.INPUT_DIR = os.path.join(root, "input")
+    Config.OUTPUT_DIR = os.path.join(root, "output")
+    Config.MERGE_DIR = os.path.join(root, "merge")
+    Config.CONVERT_DIR = os.path.join(root, "convert")
+    Config.WORK_DIR = os.path.join(root, "work")
+    Config.CACHE_DIR = os.path.join(root, "cache")
+    Config.JOURNAL_FILE = os.path.join(root, "jobs.db")
+    Config.scratch_dir = os.path.join(root, "scratch")
+    for d in [Config.INPUT_DIR, Config.OUTPUT_DIR, Config.MERGE_DIR, Config.CONVERT_DIR, Config.WORK_DIR, Config.CACHE_DIR]:
+        os.makedirs(d, exist_ok=True)
+    Config.cache_max_mb = 0  # every file is OCR'd
+    Config.batch_size = 1
+    Config.shard_pages = 0
+    Config.keep_finished_jobs = 10 ** 6
+    Config.save_config()  # add_file() reloads the config file
+
+
+def summary(values: list) -> dict:
+    """Median, p95 and max of a list of measurements (seconds are reported in ms)"""
+    values = sorted(values)
+    if not values:
+        return {}
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+        "n": len(values),
+    }
+
+
+def timed(func, repeat: int = 5) -> list:
+    """Run func `repeat` times and return the durations in seconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def wait_until(predicate, timeout: float, interval: float = 0.002):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark did not finish in time")
+        time.sleep(interval)
+
+
+def new_processor(workers: int):
+    """Started Processor with `workers` OCR workers and status changes timestamped by input path"""
+    from services.job import Status
+    from services.processor import Processor
+
+    processor = Processor()
+    processor.marks = {}  # (path, Status) -> perf_counter of the first transition
+    set_status = processor._set_status
+
+    def timestamped(job, status):
+        processor.marks.setdefault((job.path, status), time.perf_counter())
+        set_status(job, status)
+
+    processor._set_status = timestamped
+    Config.max_workers = workers
+    Config.save_config()
+    processor.start()
+
+    def finished() -> int:
+        counts = processor.counts()
+        return counts[Status.DONE] + counts[Status.ERROR]
+
+    processor.finished = finished
+    return processor
+
+
+def stop_processor(processor):
+    processor.resize_workers(0)
+    processor.journal.flush()
+
+
+@benchmark
+def bench_dispatch(root: str, args) -> dict:
+    """Latency from add_file() until a worker starts on the file, with idle workers and warm OCR processes"""
+    from services.job import Status
+
+    configure(root)
+    os.environ["OCR_STUB_PAGE_MS"] = "0"
+    count = 20 if args.quick else 200
+    paths = make_pdfs(Config.INPUT_DIR, count + 1, pages=1)
+    processor = new_processor(workers=2)
+    try:
+        start = time.perf_counter()
+        processor.add_file(paths[0])
+        wait_until(lambda: processor.finished() == 1, timeout=60)
+        worker_start = time.perf_counter() - start  # includes spawning the first OCR worker
+
+        queued, started, finished = [], [], []
+        for i, path in enumerate(paths[1:], start=2):
+            added = time.perf_counter()
+            processor.add_file(path)
+            queued.append(time.perf_counter() - added)
+            wait_until(lambda: processor.finished() == i, timeout=60)
+            started.append(processor.marks[(path, Status.PROCESSING)] - added)
+            finished.append(processor.marks[(path, Status.DONE)] - added)
+    finally:
+        stop_processor(processor)
+    return {
+        "first_job_s": round(worker_start, 3),
+        "add_file": summary(queued),
+        "dispatch": summary(started),
+        "round_trip": summary(finished),
+    }
+
+
+@benchmark
+def bench_throughput(root: str, args) -> dict:
+    """Files and pages per second for a backlog of multi-page PDFs at different worker counts"""
+    files = 12 if args.quick else 48
+    pages = 4
+    os.environ["OCR_STUB_PAGE_MS"] = str(args.page_ms)  # read by the OCR workers started below
+    results = {}
+    for workers in args.workers:
+        run_root = os.path.join(root, f"workers_{workers}")
+        configure(run_root)
+        paths = make_pdfs(Config.INPUT_DIR, files, pages=pages)
+        processor = new_processor(workers)
+        try:
+            # Warm the worker processes so the run measures steady state, not interpreter start-up
+            warmup = make_pdfs(os.path.join(run_root, "warmup"), workers, pages=1, prefix="warmup")
+            processor.add_files(warmup)
+            wait_until(lambda: processor.finished() == workers, timeout=120)
+            start = time.perf_counter()
+            processor.add_files(paths)
+            wait_until(lambda: processor.finished() == workers + files, timeout=600, interval=0.01)
+            wall = time.perf_counter() - start
+        finally:
+            stop_processor(processor)
+        results[str(workers)] = {
+            "wall_s": round(wall, 3),
+            "files_per_s": round(files / wall, 2),
+            "pages_per_s": round(files * pages / wall, 2),
+        }
+    return {"files": files, "pages_per_file": pages, "page_ms": args.page_ms, "stub_mode": args.stub_mode,
+            "by_workers": results}
+
+
+@benchmark
+def bench_scheduling(root: str, args) -> dict:
+    """
+    Simulated latency of small uploads queued behind a bulk backlog, per scheduling policy.
+    Runs the real JobQueue and policies against a virtual clock: each page takes 1 s on one of 4 workers.
+    """
+    import heapq
+    import random
+
+    from services.job import Job
+    from services.job_queue import JobQueue
+    from services.scheduling import make_policy
+
+    workers, sessions = 4, 3
+    bulk_files = 50 if args.quick else 300
+    horizon = 1800 if args.quick else 7200  # seconds during which the sessions upload
+
+    def arrivals() -> list:
+        """(time, owner, pages) of all files: the bulk drop at 0, then one small upload per session every ~2 min"""
+        rng = random.Random(42)
+        files = [(0.0, "folder", rng.randint(20, 100)) for _ in range(bulk_files)]
+        for session in range(sessions):
+            at = rng.uniform(0, 120)
+            while at < horizon:
+                files.append((at, f"session:{session}", rng.randint(1, 3)))
+                at += rng.expovariate(1 / 120)
+        return sorted(files, key=lambda file: file[0])
+
+    results = {}
+    for policy in ("fifo", "sjf", "fair"):
+        queue = JobQueue(make_policy(policy, Config.schedule_aging, Config.schedule_session_weight))
+        pending = arrivals()
+        free, busy = workers, []  # busy: heap of (finish time, sequence, job)
+        latency = {"folder": [], "session": []}
+        now, done_pages, sequence = 0.0, 0, 0
+        while pending or busy or len(queue):
+            # Next event: an arrival or a worker finishing, whichever comes first
+            if pending and (not busy or pending[0][0] <= busy[0][0]):
+                now, owner, pages = pending.pop(0)
+                job = Job(f"{owner}-{sequence}.pdf", "", pages * 100000, pages=pages, owner=owner)
+                job.queued_at = now
+                queue.put(job)
+            else:
+                now, _, job = heapq.heappop(busy)
+                free += 1
+                done_pages += job.pages
+                latency[job.owner.split(":")[0]].append(now - job.queued_at)
+            while free and len(queue):
+                job = queue.get(timeout=0)
+                sequence += 1
+                heapq.heappush(busy, (now + job.pages, sequence, job))
+                free -= 1
+        results[policy] = {
+            kind: {
+                "median_s": round(statistics.median(values), 1),
+                "p95_s": round(sorted(values)[int(len(values) * 0.95)], 1),
+                "max_s": round(max(values), 1),
+                "n": len(values),
+            }
+            for kind, values in latency.items()
+        }
+        results[policy]["pages_per_s"] = round(done_pages / now, 3)
+    return {"workers": workers, "bulk_files": bulk_files, "sessions": sessions, "by_policy": results}
+
+
+@benchmark
+def bench_watcher(root: str, args) -> dict:
+    """Rate at which DirectoryWatcher hands over new and pre-existing input files"""
+    from services.directory_watcher import DirectoryWatcher
+
+    configure(root)
+    count = 200 if args.quick else 2000
+    payload = os.urandom(64 * 1024)
+
+    # Backlog: files already present when the watcher starts
+    backlog_dir = os.path.join(root, "backlog")
+    make_files(backlog_dir, count, size=len(payload))
+    old = time.time() - 3600
+    for name in os.listdir(backlog_dir):
+        os.utime(os.path.join(backlog_dir, name), (old, old))
+    seen = []
+    done = threading.Event()
+
+    def on_scan_progress(found, finished):
+        if finished:
+            done.set()
+
+    watcher = DirectoryWatcher(backlog_dir, seen.append, on_scan_progress=on_scan_progress)
+    start = time.perf_counter()
+    watcher.start()
+    done.wait(120)
+    backlog = time.perf_counter() - start
+    watcher.stop()
+
+    # Live: files written while the watcher runs (close events mark them complete)
+    live_dir = os.path.join(root, "live")
+    os.makedirs(live_dir)
+    arrived = {}
+    watcher = DirectoryWatcher(live_dir, lambda path: arrived.setdefault(path, time.perf_counter()),
+                               stable_seconds=Config.input_stable_seconds)
+    watcher.start()
+    written = {}
+    start = time.perf_counter()
+    for i in range(count):
+        path = os.path.join(live_dir, f"live_{i:06d}.pdf")
+        with open(path, "wb") as f:
+            f.write(payload)
+        written[path] = time.perf_counter()
+    wait_until(lambda: len(arrived) >= count, timeout=120, interval=0.01)
+    live = time.perf_counter() - start
+    watcher.stop()
+    return {
+        "files": count,
+        "backlog_files_per_s": round(len(seen) / backlog, 1),
+        "live_files_per_s": round(count / live, 1),
+        "live_latency": summary([arrived[path] - written[path] for path in written]),
+    }
+
+
+@benchmark
+def bench_listing(root: str, args) -> dict:
+    """Cost of a listing page for the UI tables from the directory index, against a full directory scan"""
+    from services.dir_index import DirectoryIndex
+
+    results = {}
+    for count in ([1000] if args.quick else [1000, 10000, 50000]):
+        directory = os.path.join(root, f"listing_{count}")
+        make_files(directory, count, size=16)
+        index = DirectoryIndex(directory)
+        index.page(0, 50, "mtime")
+
+        def full_scan():
+            with os.scandir(directory) as entries:
+                files = [(entry.name, entry.stat().st_size, entry.stat().st_mtime) for entry in entries]
+            files.sort(key=lambda item: item[0].lower())
+            return files[:50]
+
+        def page_sorted_by_name():
+            index._sorted.clear()  # as after a change to the directory
+            index.page(0, 50, "name")
+
+        results[str(count)] = {
+            "index_scan": summary(timed(index.scan, repeat=3)),
+            "page_after_change": summary(timed(page_sorted_by_name)),
+            "page_cached": summary(timed(lambda: index.page(count // 2, 50, "mtime", descending=True), repeat=50)),
+            "full_scan_page": summary(timed(full_scan)),
+        }
+    return results
+
+
+@benchmark
+def bench_fanout(root: str, args) -> dict:
+    """Cost of publishing a job change to the UpdateBus with many connected UI clients"""
+    from services.update_bus import UpdateBus
+
+    events = 2000 if args.quick else 20000
+    results = {}
+    for clients in (1, 10, 100):
+        bus = UpdateBus()
+        subscriptions = [bus.subscribe() for _ in range(clients)]
+
+        def publish():
+            for i in range(events):
+                bus.publish("jobs", i % 500)
+
+        publish_s = min(timed(publish, repeat=3))
+        take_s = min(timed(lambda: [subscription.take() for subscription in subscriptions], repeat=1))
+        results[str(clients)] = {
+            "publish_us": round(publish_s / events * 1e6, 3),
+            "take_all_ms": round(take_s * 1000, 3),
+        }
+    return {"events": events, "by_clients": results}
+
+
+@benchmark
+def bench_memory(root: str, args) -> dict:
+    """Memory held per queued job, and the resident size of an OCR worker process"""
+    from services.job import Job
+    from services.processor import Processor
+
+    configure(root)
+    count = 10000 if args.quick else 100000
+    processor = Processor()  # not started: jobs stay queued
+    settings = processor.ocr_settings()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(count):
+        processor._enqueue(Job(f"doc_{i:06d}.pdf", os.path.join(Config.INPUT_DIR, f"doc_{i:06d}.pdf"), 123456,
+                               pages=4, settings=dict(settings)), notify=False)
+    queued = tracemalloc.take_snapshot()
+    processor.get_file_list()
+    listed = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    processor.queue.clear()
+
+    def grown(new, old) -> int:
+        return sum(stat.size_diff for stat in new.compare_to(old, "filename"))
+
+    os.environ["OCR_STUB_PAGE_MS"] = "0"
+    result = processor.engine.run(*make_pdfs(os.path.join(root, "rss"), 1), os.path.join(root, "rss.pdf"), {})
+    processor.engine.trim(0)
+    return {
+        "jobs": count,
+        "bytes_per_job": round(grown(queued, before) / count, 1),
+        "snapshot_bytes_per_job": round(grown(listed, queued) / count, 1),
+        "worker_rss_mb": round(result.get("rss_kb", 0) / 1024, 1),
+        "harness_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+@benchmark
+def bench_convert(root: str, args) -> dict:
+    """Image-to-PDF conversion and merging of the results"""
+    from services.functions import convert_image, merge_pdfs
+
+    configure(root)
+    count = 5 if args.quick else 40
+    images = make_images(Config.MERGE_DIR, count)
+    start = time.perf_counter()
+    pdfs = [convert_image(path) for path in images]
+    convert = time.perf_counter() - start
+    start = time.perf_counter()
+    merge_pdfs(pdfs, os.path.join(Config.OUTPUT_DIR, "merged.pdf"))
+    merge = time.perf_counter() - start
+    return {
+        "images": count,
+        "convert_images_per_s": round(count / convert, 2),
+        "merge_s": round(merge, 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline_path: str, results: dict):
+    """Print every metric next to the baseline run with the relative change"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = flatten(json.load(f)["benchmarks"])
+    current = flatten(results["benchmarks"])
+    print(f"\nCompared with {baseline_path}:")
+    for key, value in current.items():
+        if key not in baseline or key.endswith(".n"):
+            continue
+        old = baseline[key]
+        change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {key:60} {old:>12} -> {value:<12} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a fast sanity check")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts for throughput")
+    parser.add_argument("--page-ms", type=int, default=50, help="stub OCR time per page in milliseconds")
+    parser.add_argument("--stub-mode", choices=["sleep", "cpu"], default="sleep",
+                        help="stub OCR sleeps (I/O-like) or burns CPU for its time per page")
+    parser.add_argument("--output", help="JSON result file (default: benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier result file to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary data directory")
+    parser.add_argument("--verbose", action="store_true", help="show the app's log output")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(message)s")
+    os.environ["OCR_STUB_MODE"] = args.stub_mode
+    commit = git_commit()
+    results = {
+        "meta": {
+            "commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "benchmarks": {},
+    }
+
+    root = tempfile.mkdtemp(prefix="ocr-bench-")
+    try:
+        for name in args.names or BENCHMARKS:
+            print(f"{name} ...", flush=True)
+            start = time.perf_counter()
+            results["benchmarks"][name] = BENCHMARKS[name](os.path.join(root, name), args)
+            print(f"{name}: {json.dumps(results['benchmarks'][name])} ({time.perf_counter() - start:.1f} s)")
+    finally:
+        if args.keep:
+            print(f"Data kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
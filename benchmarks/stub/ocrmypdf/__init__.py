@@ -0,0 +1,71 @@
+"""
+Stand-in for ocrmypdf used by the benchmarks.
+
+Put the parent directory first on PYTHONPATH and the OCR worker processes load
+this module instead of the real ocrmypdf. ocr() copies the input to the output
+and spends a configurable time per page instead of running tesseract, reporting
+each page to the progress bars of the given plugins like the "OCR" step does:
+
+    OCR_STUB_PAGE_MS  milliseconds per page (default 50)
+    OCR_STUB_MODE     "sleep" (default) or "cpu" to busy-loop instead
+    OCR_STUB_FAIL     fail files whose name contains this text
+"""
+import importlib
+import os
+import shutil
+import time
+from enum import IntEnum
+
+import pikepdf
+
+__version__ = "0.0.0+benchmark-stub"
+
+
+class ExitCode(IntEnum):
+    ok = 0
+    input_file = 2
+    child_process_error = 15
+
+
+def hookimpl(func=None, **kwargs):
+    """Plugin hook marker; plugins are called directly here"""
+    if func is None:
+        return lambda f: f
+    return func
+
+
+def _spend(seconds: float, mode: str):
+    if mode == "cpu":
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+    else:
+        time.sleep(seconds)
+
+
+def ocr(input_file, output_file, jobs: int = 1, plugins=(), **options) -> ExitCode:
+    """Pretend to OCR input_file: per-page cost is spread over `jobs` cores like ocrmypdf does"""
+    fail = os.environ.get("OCR_STUB_FAIL")
+    if fail and fail in os.path.basename(str(input_file)):
+        return ExitCode.child_process_error
+
+    try:
+        with pikepdf.open(input_file) as pdf:
+            pages = len(pdf.pages)
+    except pikepdf.PdfError:
+        return ExitCode.input_file
+
+    page_seconds = float(os.environ.get("OCR_STUB_PAGE_MS", "50")) / 1000
+    parallel = max(1, min(int(jobs or 1), pages))
+    bars = [importlib.import_module(plugin).get_progressbar_class()(total=pages, desc="OCR", unit="page")
+            for plugin in plugins]
+    for bar in bars:
+        bar.__enter__()
+    for _ in range(pages):
+        _spend(page_seconds / parallel, os.environ.get("OCR_STUB_MODE", "sleep"))
+        for bar in bars:
+            bar.update(1)
+    for bar in bars:
+        bar.__exit__(None, None, None)
+    shutil.copyfile(input_file, output_file)
+    return ExitCode.ok
@@ -0,0 +1,70 @@
+"""Synthetic inputs for the benchmarks: scanned-looking rasters, images and PDFs built locally"""
+import io
+import os
+import random
+
+import img2pdf
+from PIL import Image, ImageDraw
+
+
+def make_raster(width: int = 850, height: int = 1100, seed: int = 0) -> Image.Image:
+    """Grayscale page with lines of dark 'words' on light paper noise, roughly like a text scan"""
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 12).point(lambda value: 215 + value // 8)
+    draw = ImageDraw.Draw(image)
+    margin = width // 12
+    line_height = max(12, height // 40)
+    for y in range(margin, height - margin, line_height):
+        x = margin
+        while x < width - margin:
+            word = rng.randint(line_height // 2, line_height * 3)
+            draw.rectangle((x, y, min(x + word, width - margin), y + line_height * 2 // 3), fill=rng.randint(10, 60))
+            x += word + line_height // 2
+    return image
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=75)
+    return buffer.getvalue()
+
+
+def make_pdfs(directory: str, count: int, pages: int = 1, prefix: str = "doc") -> list:
+    """Write `count` distinct PDFs of `pages` pages each; returns their paths"""
+    os.makedirs(directory, exist_ok=True)
+    # Render a few pages once and reuse the encoded JPEGs; rasterising is much slower than what is measured
+    pool = [_jpeg(make_raster(seed=seed)) for seed in range(max(pages, 4))]
+    layout = img2pdf.get_fixed_dpi_layout_fun((100, 100))
+    paths = []
+    for i in range(count):
+        images = [pool[(i + page) % len(pool)] for page in range(pages)]
+        # The title keeps every file distinct, so result cache keys differ too
+        path = os.path.join(directory, f"{prefix}_{i:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(img2pdf.convert(images, layout_fun=layout, title=f"{prefix} {i}"))
+        paths.append(path)
+    return paths
+
+
+def make_images(directory: str, count: int, fmt: str = "png", prefix: str = "img") -> list:
+    """Write `count` synthetic page images; returns their paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{prefix}_{i:05d}.{fmt}")
+        make_raster(seed=i).save(path)
+        paths.append(path)
+    return paths
+
+
+def make_files(directory: str, count: int, size: int = 4096, prefix: str = "file") -> list:
+    """Write `count` small placeholder files, for listing benchmarks where the content does not matter"""
+    os.makedirs(directory, exist_ok=True)
+    payload = os.urandom(size)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{prefix}_{i:06d}.pdf")
+        with open(path, "wb") as f:
+            f.write(payload)
+        paths.append(path)
+    return paths